@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# Pontuação em lote, em fluxo e com memória limitada, para arquivos CSV/JSONL grandes
+
+import os
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from chunk_writers import open_writer
+from features import build_features
+from result_cache import ResultCache, chunk_key, model_fingerprint, record_run
+from score_server import load_model
+
+# Ordem fixa das colunas de saída; colunas extras da entrada vêm depois, em ordem alfabética
+OUTPUT_COLUMNS = ["temperatura", "temperatura_squared", "requisicao", "vendas_previstas"]
+
+# Modelo carregado uma única vez por processo do pool
+_worker_model = None
+
+
+def iter_csv_chunks(path, chunk_size):
+    """Lê um CSV no formato de data/sorvetes.csv em blocos de `chunk_size` linhas."""
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if "temperatura" not in chunk.columns:
+            raise ValueError(f"Coluna 'temperatura' ausente em {path}")
+        yield chunk
+
+
+def iter_jsonl_chunks(path, chunk_size):
+    """
+    Lê um arquivo JSONL em blocos de `chunk_size` linhas de saída.
+
+    Cada linha pode ser um payload completo ({"input_data": {"columns": [...], "data": [...]}})
+    ou um registro simples ({"temperatura": 25.0, ...}). A coluna "requisicao" guarda o
+    número da linha de origem para permitir reassociar as previsões.
+    """
+    records = []
+    with open(path) as f:
+        for line_number, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            payload = json.loads(line)
+            if "input_data" in payload:
+                columns = payload["input_data"]["columns"]
+                for row in payload["input_data"]["data"]:
+                    record = dict(zip(columns, row))
+                    record["requisicao"] = line_number
+                    records.append(record)
+            else:
+                payload["requisicao"] = line_number
+                records.append(payload)
+
+            while len(records) >= chunk_size:
+                yield pd.DataFrame.from_records(records[:chunk_size])
+                del records[:chunk_size]
+    if records:
+        yield pd.DataFrame.from_records(records)
+
+
+def iter_chunks(path, chunk_size):
+    """Escolhe o leitor pelo sufixo do arquivo."""
+    if path.endswith((".jsonl", ".ndjson")):
+        return iter_jsonl_chunks(path, chunk_size)
+    return iter_csv_chunks(path, chunk_size)
+
+
+def predict_temperatures(model, temperatures):
+    n_features = getattr(model, "n_features_in_", 1)
+    return np.asarray(model.predict(build_features(temperatures, n_features)), dtype=np.float64).ravel()
+
+
+def attach_predictions(chunk, predictions):
+    """Deriva temperatura_squared e adiciona a coluna vendas_previstas ao bloco."""
+    chunk["temperatura_squared"] = chunk["temperatura"].to_numpy(dtype=np.float64) ** 2
+    chunk["vendas_previstas"] = predictions
+    return chunk
+
+
+def score_chunk(model, chunk):
+    temperatures = chunk["temperatura"].to_numpy(dtype=np.float64)
+    return attach_predictions(chunk, predict_temperatures(model, temperatures))
+
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = load_model(model_path)
+
+
+def _predict_in_worker(temperatures):
+    return predict_temperatures(_worker_model, temperatures)
+
+
+def score_stream(chunks, model_path, workers=1, cache=None):
+    """
+    Pontua um gerador de blocos preservando a ordem.
+
+    Com `workers` > 1 as temperaturas de cada bloco são distribuídas entre processos,
+    mantendo no máximo 2 blocos por processo em voo para que a memória continue limitada.
+    Com um ResultCache, blocos já pontuados pelo mesmo modelo vêm do disco e só os
+    demais são enviados ao modelo, que só é carregado na primeira falta.
+    """
+    model = None
+    pool = None
+    in_flight = deque()
+
+    def finish(chunk, key, predictions):
+        if key is not None:
+            cache.put(key, predictions)
+        return attach_predictions(chunk, predictions)
+
+    try:
+        for chunk in chunks:
+            temperatures = chunk["temperatura"].to_numpy(dtype=np.float64)
+            key = chunk_key(temperatures) if cache is not None else None
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                in_flight.append((chunk, None, cached))
+            elif workers <= 1:
+                if model is None:
+                    model = load_model(model_path)
+                in_flight.append((chunk, key, predict_temperatures(model, temperatures)))
+            else:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,))
+                in_flight.append((chunk, key, pool.submit(_predict_in_worker, temperatures)))
+
+            while in_flight and (len(in_flight) >= 2 * workers or isinstance(in_flight[0][2], np.ndarray)):
+                chunk, key, result = in_flight.popleft()
+                yield finish(chunk, key, result if isinstance(result, np.ndarray) else result.result())
+        while in_flight:
+            chunk, key, result = in_flight.popleft()
+            yield finish(chunk, key, result if isinstance(result, np.ndarray) else result.result())
+    finally:
+        if pool is not None:
+            # Equivalente a shutdown(cancel_futures=True), que só existe a partir do Python 3.9
+            for _, _, result in in_flight:
+                if not isinstance(result, np.ndarray):
+                    result.cancel()
+            pool.shutdown()
+
+
+def output_columns(chunk):
+    known = [column for column in OUTPUT_COLUMNS if column in chunk.columns]
+    return known + sorted(str(column) for column in chunk.columns if column not in OUTPUT_COLUMNS)
+
+
+def score_file(input_path, output_path, model_path, chunk_size=100000, workers=1, cache=None):
+    """
+    Pontua `input_path` inteiro e grava o resultado em `output_path`. Retorna o número de linhas.
+
+    Todos os blocos são gravados nas colunas do primeiro (ver OUTPUT_COLUMNS): um JSONL que
+    mistura payloads completos e registros simples gera blocos com colunas em ordens diferentes.
+    """
+    writer = open_writer(output_path)
+    rows = 0
+    columns = None
+    try:
+        for scored in score_stream(iter_chunks(input_path, chunk_size), model_path, workers, cache):
+            if columns is None:
+                columns = output_columns(scored)
+            dropped = [column for column in scored.columns if column not in columns]
+            if dropped:
+                print(f"Aviso: colunas ausentes no primeiro bloco foram descartadas: {', '.join(map(str, dropped))}")
+            writer.write(scored.reindex(columns=columns))
+            rows += len(scored)
+    finally:
+        writer.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pontuação em lote de arquivos CSV/JSONL com o modelo de vendas de sorvete")
+    parser.add_argument("--input", type=str, required=True, help="Arquivo de entrada (.csv, .jsonl)")
+    parser.add_argument("--output", type=str, required=True, help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--model-path", type=str, default="mlflow_model", help="Caminho do modelo (diretório MLflow ou artefato .npz/.json)")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Linhas por bloco")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para pontuar blocos em paralelo")
+    parser.add_argument("--cache-dir", type=str, help="Diretório do cache de previsões por bloco (reaproveitado entre execuções)")
+    parser.add_argument("--cache-max-mb", type=float, default=1024, help="Tamanho máximo do cache em MB (remove os menos usados)")
+    parser.add_argument("--model-name", type=str, default="sorvete-vendas-model", help="Nome do modelo registrado (chave do cache)")
+    parser.add_argument("--model-version", type=str, help="Versão registrada do modelo (padrão: hash do artefato)")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Erro: arquivo de entrada não encontrado: {args.input}")
+        exit(1)
+
+    cache = None
+    if args.cache_dir:
+        model_version = args.model_version or model_fingerprint(args.model_path)
+        cache = ResultCache(args.cache_dir, args.model_name, model_version, int(args.cache_max_mb * 1024 * 1024))
+
+    start = time.perf_counter()
+    rows = score_file(args.input, args.output, args.model_path, args.chunk_size, args.workers, cache)
+    elapsed = time.perf_counter() - start
+    print(f"{rows} linhas pontuadas em {elapsed:.1f}s ({rows / elapsed:.0f} linhas/s) → {args.output}")
+
+    if cache is not None:
+        stats = record_run(args.cache_dir, cache.stats(), input=args.input, rows=rows, elapsed_s=elapsed)
+        print(f"Cache: {stats['chunks_hit']}/{stats['chunks_hit'] + stats['chunks_missed']} blocos reaproveitados "
+              f"({stats['hit_ratio']:.0%} dos blocos, {stats['row_hit_ratio']:.0%} das linhas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# Suíte de benchmarks: treino, serialização do modelo, payload, pós-processamento e latência ponta a ponta
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+from timeit import Timer
+
+import numpy as np
+
+SIZES = [1000, 100000, 1000000]
+PAYLOAD_SIZES = [24, 10000, 100000]
+QUICK_SIZES = [1000, 10000]
+QUICK_PAYLOAD_SIZES = [24, 1000]
+
+
+def timeit(func, repeats, min_time=0.2):
+    """
+    Tempo por chamada de `func` (s). Depois de uma chamada de aquecimento, o número de
+    chamadas por amostra cresce (como em Timer.autorange) até a amostra levar `min_time`,
+    para que casos de microssegundos não sejam dominados pelo ruído do relógio.
+    """
+    func()  # Aquecimento: imports, caches e alocações da primeira chamada ficam fora da medida
+    timer = Timer(func)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time * 1.2 / max(elapsed, 1e-9)))
+    timings = [timer.timeit(loops) / loops for _ in range(repeats)]
+    return {"median_s": float(np.median(timings)), "min_s": float(np.min(timings)), "repeats": repeats, "loops": loops}
+
+
+def sample_data(n, seed=42):
+    """Temperaturas e vendas do mesmo processo usado pelo synthetic_data."""
+    from synthetic_data import iter_blocks
+
+    blocks = list(iter_blocks(n_days=n, seed=seed))
+    return (np.concatenate([block["temperatura"] for block in blocks]),
+            np.concatenate([block["vendas"] for block in blocks]))
+
+
+def bench_fit(sizes, repeats):
+    """LinearRegression().fit como em create_train_model_if_needed."""
+    from sklearn.linear_model import LinearRegression
+
+    results = {}
+    for n in sizes:
+        temperatures, sales = sample_data(n)
+        X = temperatures.reshape(-1, 1)
+        results[f"fit[n={n}]"] = timeit(lambda: LinearRegression().fit(X, sales), repeats)
+    return results
+
+
+def bench_mlflow(repeats):
+    """mlflow.sklearn.save_model / load_model do modelo de uma variável."""
+    import mlflow.sklearn
+    from sklearn.linear_model import LinearRegression
+
+    temperatures, sales = sample_data(100)
+    model = LinearRegression().fit(temperatures.reshape(-1, 1), sales)
+    workdir = tempfile.mkdtemp(prefix="bench_mlflow_")
+    path = os.path.join(workdir, "model")
+
+    def save():
+        shutil.rmtree(path, ignore_errors=True)
+        mlflow.sklearn.save_model(model, path)
+
+    try:
+        results = {"mlflow_save": timeit(save, repeats)}
+        results["mlflow_load"] = timeit(lambda: mlflow.sklearn.load_model(path), repeats)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def bench_payload(sizes, repeats):
+    """Montagem do payload "input_data" como em test_endpoint/test_model, em JSON e float32."""
+    from payload_codec import encode_request
+
+    results = {}
+    for n in sizes:
+        temperatures = np.linspace(15, 38, n)
+        squared_temps = temperatures ** 2
+
+        def legacy_json():
+            body = {
+                "input_data": {
+                    "columns": ["temperatura", "temperatura_squared"],
+                    "data": [[temp, temp_sq] for temp, temp_sq in zip(temperatures, squared_temps)]
+                }
+            }
+            return json.dumps(body)
+
+        results[f"payload_json_legacy[n={n}]"] = timeit(legacy_json, repeats)
+        results[f"payload_json[n={n}]"] = timeit(lambda: encode_request(temperatures, "json"), repeats)
+        results[f"payload_float32[n={n}]"] = timeit(lambda: encode_request(temperatures, "float32"), repeats)
+    return results
+
+
+def bench_postprocess(sizes, repeats):
+    """pd.cut em percentis + groupby por categoria (versão original) e o equivalente do forecast_analytics."""
+    import pandas as pd
+    from forecast_analytics import summarize
+
+    results = {}
+    for n in sizes:
+        temperatures = np.linspace(15, 38, n)
+        predictions = 100 + 10 * (temperatures - 20)
+
+        def postprocess():
+            df = pd.DataFrame({"temperatura": temperatures, "vendas_previstas": predictions})
+            low, high = np.percentile(predictions, [25, 75])
+            df["categoria"] = pd.cut(df["vendas_previstas"], bins=[0, low, high, float("inf")], labels=["Baixa", "Média", "Alta"])
+            return {category: len(group) for category, group in df.groupby("categoria", observed=True)}
+
+        results[f"postprocess[n={n}]"] = timeit(postprocess, repeats)
+        results[f"postprocess_numpy[n={n}]"] = timeit(lambda: summarize(temperatures, predictions), repeats)
+    return results
+
+
+def bench_end_to_end(sizes, requests_per_size):
+    """Latência de requisições sequenciais contra um score_server local (alvo substituto do Azure)."""
+    import endpoint_client
+    from coef_model import CoefModel
+    from payload_codec import encode_request
+    from score_server import start_background_server
+
+    server, url = start_background_server(CoefModel([10.0], -100.0), window_ms=0.0)
+    results = {}
+    try:
+        for n in sizes:
+            body, content_type = encode_request(np.linspace(15, 38, n), "json")
+            headers = {"Content-Type": content_type}
+            endpoint_client.post(url, body, headers).raise_for_status()
+            latencies = []
+            for _ in range(requests_per_size):
+                start = time.perf_counter()
+                endpoint_client.post(url, body, headers).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            results[f"e2e_request[n={n}]"] = {
+                "median_s": float(p50),
+                "p99_s": float(p99),
+                "min_s": float(np.min(latencies)),
+                "repeats": requests_per_size
+            }
+    finally:
+        server.shutdown()
+        endpoint_client.close_sessions()
+    return results
+
+
+SUITES = {
+    "fit": lambda args: bench_fit(args.sizes, args.repeats),
+    "mlflow": lambda args: bench_mlflow(args.repeats),
+    "payload": lambda args: bench_payload(args.payload_sizes, args.repeats),
+    "postprocess": lambda args: bench_postprocess(args.sizes, args.repeats),
+    "e2e": lambda args: bench_end_to_end(args.payload_sizes, args.requests)
+}
+
+
+def compare(results, baseline, threshold, overrides):
+    """
+    Compara cada benchmark com a linha de base: o melhor tempo por chamada para os medidos
+    com timeit (o mínimo é o menos afetado por interferência da máquina) e a mediana para
+    as latências ponta a ponta. Retorna a lista de regressões (razão acima de 1 + limite).
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        key = "min_s" if "loops" in current and "loops" in reference else "median_s"
+        ratio = current[key] / reference[key] if reference[key] else float("inf")
+        limit = overrides.get(name.split("[")[0], threshold)
+        status = "REGRESSÃO" if ratio > 1 + limit else "ok"
+        print(f"{name:<40} {reference[key] * 1000:>10.3f} ms → {current[key] * 1000:>10.3f} ms  ({ratio:5.2f}x) {status}")
+        if status != "ok":
+            regressions.append({"name": name, "ratio": ratio, "limit": limit})
+    return regressions
+
+
+def parse_overrides(values):
+    """Converte ["fit=0.5", "e2e_request=1.0"] em {"fit": 0.5, "e2e_request": 1.0}."""
+    overrides = {}
+    for value in values or []:
+        name, _, limit = value.partition("=")
+        overrides[name] = float(limit)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de previsão de vendas de sorvete")
+    parser.add_argument("--suites", type=str, nargs="+", choices=sorted(SUITES), default=sorted(SUITES), help="Grupos de benchmark a executar")
+    parser.add_argument("--quick", action="store_true", help="Usa tamanhos pequenos (para CI)")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetições por benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por tamanho no benchmark ponta a ponta")
+    parser.add_argument("--output", type=str, default="bench_results.json", help="Arquivo JSON com os resultados")
+    parser.add_argument("--baseline", type=str, help="Resultados anteriores para comparação")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Piora relativa tolerada (0.2 = 20%%)")
+    parser.add_argument("--threshold-for", type=str, nargs="*", help="Limites por benchmark, ex.: e2e_request=0.5")
+    parser.add_argument("--save-baseline", type=str, help="Também grava os resultados como nova linha de base")
+
+    args = parser.parse_args()
+    args.sizes = QUICK_SIZES if args.quick else SIZES
+    args.payload_sizes = QUICK_PAYLOAD_SIZES if args.quick else PAYLOAD_SIZES
+
+    results = {}
+    for suite in args.suites:
+        print(f"Executando benchmarks '{suite}'...")
+        results.update(SUITES[suite](args))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"\nResultados salvos em '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"\nComparação com '{args.baseline}' (limite: +{args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold, parse_overrides(args.threshold_for))
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) de desempenho detectada(s)")
+            exit(1)
+        print("\nNenhuma regressão de desempenho")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# Implantação canário: aumenta o tráfego da nova implantação em etapas, guiada por SLOs de latência e erro
+
+import json
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import endpoint_client
+from load_test import run_benchmark
+from provisioning import wait_for
+
+# Cabeçalho do Azure ML que direciona a requisição a uma implantação específica do endpoint
+DEPLOYMENT_HEADER = "azureml-model-deployment"
+
+
+class AzureTraffic:
+    """Tráfego e espelhamento de um endpoint online do Azure ML (real ou FakeMLClient)."""
+
+    def __init__(self, ml_client, endpoint_name):
+        self.ml_client = ml_client
+        self.endpoint_name = endpoint_name
+
+    def _update(self, attribute, value, label):
+        endpoint = self.ml_client.online_endpoints.get(self.endpoint_name)
+        setattr(endpoint, attribute, value)
+        wait_for(self.ml_client.online_endpoints.begin_create_or_update(endpoint), label)
+
+    def get_traffic(self):
+        return dict(self.ml_client.online_endpoints.get(self.endpoint_name).traffic or {})
+
+    def set_traffic(self, traffic):
+        self._update("traffic", dict(traffic), "atualização de tráfego")
+
+    def set_mirror(self, mirror):
+        self._update("mirror_traffic", dict(mirror), "espelhamento de tráfego")
+
+    def scoring_uri(self):
+        return self.ml_client.online_endpoints.get(self.endpoint_name).scoring_uri
+
+    def auth_headers(self):
+        return endpoint_client.get_auth_header(self.ml_client.online_endpoints.get_keys(self.endpoint_name).primary_key)
+
+
+class RouterHandler(BaseHTTPRequestHandler):
+    """Encaminha cada POST a uma implantação local, como o balanceador do endpoint gerenciado."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        traffic = self.server.traffic
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        headers = {name: self.headers[name] for name in ("Content-Type", "Accept", "Authorization") if self.headers.get(name)}
+        name = self.headers.get(DEPLOYMENT_HEADER)
+        if not name:
+            try:
+                name = traffic.choose()
+            except RuntimeError as e:
+                self._send(503, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+                return
+        if name not in traffic.backends:
+            self._send(404, json.dumps({"error": f"Implantação desconhecida: {name}"}).encode("utf-8"), "application/json")
+            return
+
+        for target, percent in traffic.mirror.items():
+            if random.random() * 100 < percent:
+                traffic.mirror_pool.submit(traffic.forward, target, body, headers)
+        try:
+            response = traffic.forward(name, body, headers)
+        except Exception as e:
+            self._send(502, json.dumps({"error": f"Falha ao encaminhar para {name}: {e}"}).encode("utf-8"), "application/json")
+            return
+        self._send(response.status_code, response.content, response.headers.get("Content-Type", "application/json"))
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalTraffic:
+    """
+    Roteador HTTP local com a mesma interface de AzureTraffic, na frente de servidores
+    de pontuação locais (score_server.py): divide o tráfego pelos pesos de `traffic`,
+    respeita o cabeçalho azureml-model-deployment e espelha cópias conforme `mirror`
+    (as respostas espelhadas são descartadas, como no Azure).
+    """
+
+    def __init__(self, backends, host="127.0.0.1", port=0):
+        from score_server import ScoringServer
+
+        self.backends = dict(backends)
+        self.traffic = {name: 0 for name in self.backends}
+        self.mirror = {}
+        self.requests = {name: 0 for name in self.backends}
+        self._lock = threading.Lock()
+        self.mirror_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="mirror")
+        self.server = ScoringServer((host, port), RouterHandler)
+        self.server.traffic = self
+        threading.Thread(target=self.server.serve_forever, name="traffic-router", daemon=True).start()
+
+    def choose(self):
+        names = [name for name, percent in self.traffic.items() if percent > 0]
+        if not names:
+            raise RuntimeError("Nenhuma implantação recebe tráfego")
+        return random.choices(names, weights=[self.traffic[name] for name in names])[0]
+
+    def forward(self, name, body, headers):
+        with self._lock:
+            self.requests[name] += 1
+        return endpoint_client.post(self.backends[name], body, headers)
+
+    def get_traffic(self):
+        return dict(self.traffic)
+
+    def set_traffic(self, traffic):
+        unknown = set(traffic) - set(self.backends)
+        if unknown:
+            raise ValueError(f"Implantações desconhecidas: {sorted(unknown)}")
+        if sum(traffic.values()) != 100:
+            raise ValueError("A soma do tráfego deve ser 100%")
+        self.traffic = {name: traffic.get(name, 0) for name in self.backends}
+
+    def set_mirror(self, mirror):
+        self.mirror = {name: percent for name, percent in mirror.items() if percent > 0}
+
+    def scoring_uri(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/score"
+
+    def auth_headers(self):
+        return {}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.mirror_pool.shutdown(wait=False)
+
+
+class SLO:
+    """
+    Limites que a nova implantação precisa respeitar em relação à atual. As razões de
+    latência só contam acima de `tolerance_ms`, para que ruído de frações de ms não
+    reprove um modelo igualmente rápido.
+    """
+
+    def __init__(self, max_p50_ratio=1.25, max_p99_ratio=1.5, max_error_rate=0.01, max_p99_ms=None, tolerance_ms=2.0):
+        self.max_p50_ratio = max_p50_ratio
+        self.max_p99_ratio = max_p99_ratio
+        self.max_error_rate = max_error_rate
+        self.max_p99_ms = max_p99_ms
+        self.tolerance_ms = tolerance_ms
+
+    def violations(self, candidate, incumbent=None):
+        """Lista (vazia se tudo ok) das violações do candidato."""
+        problems = []
+        if not candidate["requests"]:
+            return ["nenhuma requisição medida"]
+        if candidate["error_rate"] > self.max_error_rate:
+            problems.append(f"taxa de erro {candidate['error_rate']:.2%} > {self.max_error_rate:.2%}")
+        latency = candidate["latency_ms"]
+        if not latency:
+            return problems + ["sem latências medidas"]
+        if self.max_p99_ms is not None and latency["p99"] > self.max_p99_ms:
+            problems.append(f"p99 {latency['p99']:.1f} ms > {self.max_p99_ms:.1f} ms")
+        reference = (incumbent or {}).get("latency_ms")
+        if reference:
+            for key, ratio in (("p50", self.max_p50_ratio), ("p99", self.max_p99_ratio)):
+                limit = reference[key] * ratio + self.tolerance_ms
+                if latency[key] > limit:
+                    problems.append(f"{key} {latency[key]:.1f} ms > {limit:.1f} ms ({ratio}x a implantação atual {reference[key]:.1f} ms)")
+        return problems
+
+
+def parse_steps(steps):
+    """Converte as etapas de tráfego (%) e exige valores estritamente crescentes entre 1 e 100, terminando em 100."""
+    try:
+        steps = [int(step) for step in steps]
+    except ValueError:
+        raise ValueError(f"Etapas de tráfego inválidas: {list(steps)}")
+    if not steps or steps[0] < 1 or steps[-1] != 100 or any(b <= a for a, b in zip(steps, steps[1:])):
+        raise ValueError(f"Etapas de tráfego inválidas: {steps}; use valores crescentes entre 1 e 100 terminando em 100")
+    return steps
+
+
+class CanaryPolicy:
+    """Etapas de tráfego (%), espelhamento inicial, janelas de observação e SLO do rollout."""
+
+    def __init__(self, steps=(5, 25, 50, 100), mirror_percent=0, observe_s=60.0, checks_per_step=3,
+                 probe_rps=20.0, probe_concurrency=4, slo=None):
+        self.steps = parse_steps(steps)
+        self.mirror_percent = mirror_percent
+        self.observe_s = observe_s
+        self.checks_per_step = checks_per_step
+        self.probe_rps = probe_rps
+        self.probe_concurrency = probe_concurrency
+        self.slo = slo or SLO()
+
+
+def measure(url, headers, deployments, duration, rps, concurrency):
+    """Mede ao mesmo tempo cada implantação (via azureml-model-deployment) e retorna {nome: relatório}."""
+    def probe(name):
+        return run_benchmark(url, headers=dict(headers, **{DEPLOYMENT_HEADER: name}), concurrency=concurrency,
+                             duration=duration, target_rps=rps)
+
+    with ThreadPoolExecutor(max_workers=len(deployments)) as pool:
+        return dict(zip(deployments, pool.map(probe, deployments)))
+
+
+def _summary(report):
+    latency = report["latency_ms"] or {}
+    return {"requests": report["requests"], "error_rate": report["error_rate"],
+            "p50_ms": latency.get("p50"), "p99_ms": latency.get("p99")}
+
+
+def canary_rollout(traffic, incumbent, candidate, policy=None):
+    """
+    Leva `candidate` de 0% a 100% do tráfego seguindo `policy.steps`, comparando a cada
+    janela de observação a latência p50/p99 e a taxa de erro com `incumbent`.
+
+    Com `policy.mirror_percent`, antes de receber tráfego real o candidato recebe uma
+    cópia dessa fração das requisições (fase de sombra). Qualquer violação do SLO
+    devolve 100% do tráfego a `incumbent` e encerra o rollout.
+
+    Retorna (sucesso, histórico das verificações).
+    """
+    policy = policy or CanaryPolicy()
+    url = traffic.scoring_uri()
+    headers = traffic.auth_headers()
+    window = policy.observe_s / max(policy.checks_per_step, 1)
+    history = []
+
+    def observe(phase, percent):
+        for check in range(policy.checks_per_step):
+            reports = measure(url, headers, [incumbent, candidate], window, policy.probe_rps, policy.probe_concurrency)
+            problems = policy.slo.violations(reports[candidate], reports[incumbent])
+            history.append({
+                "phase": phase,
+                "candidate_percent": percent,
+                "check": check + 1,
+                "incumbent": _summary(reports[incumbent]),
+                "candidate": _summary(reports[candidate]),
+                "violations": problems
+            })
+            status = "ok" if not problems else "; ".join(problems)
+            candidate_p99 = history[-1]["candidate"]["p99_ms"] or float("nan")
+            incumbent_p99 = history[-1]["incumbent"]["p99_ms"] or float("nan")
+            print(f"  [{phase} {percent}%] verificação {check + 1}/{policy.checks_per_step}: "
+                  f"p99 {candidate_p99:.1f} ms vs {incumbent_p99:.1f} ms → {status}")
+            if problems:
+                return False
+        return True
+
+    def rollback(reason):
+        print(f"Rollback: {reason}. Devolvendo 100% do tráfego para {incumbent}")
+        traffic.set_mirror({})
+        traffic.set_traffic({incumbent: 100, candidate: 0})
+        return False, history
+
+    if policy.mirror_percent:
+        print(f"Espelhando {policy.mirror_percent}% do tráfego para {candidate} (sombra)")
+        traffic.set_mirror({candidate: policy.mirror_percent})
+        if not observe("sombra", 0):
+            return rollback("SLO violado durante o espelhamento")
+        traffic.set_mirror({})
+
+    for percent in policy.steps:
+        print(f"Tráfego: {100 - percent}% {incumbent} / {percent}% {candidate}")
+        traffic.set_traffic({incumbent: 100 - percent, candidate: percent})
+        if percent < 100 and not observe("canário", percent):
+            return rollback(f"SLO violado com {percent}% do tráfego")
+
+    print(f"Rollout concluído: 100% do tráfego em {candidate}")
+    return True, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ensaia um rollout canário entre dois servidores de pontuação locais")
+    parser.add_argument("--incumbent-model", type=str, default="mlflow_model", help="Modelo da implantação atual")
+    parser.add_argument("--candidate-model", type=str, default="mlflow_model", help="Modelo da nova implantação")
+    parser.add_argument("--candidate-window-ms", type=float, default=2.0, help="Janela de micro-batching do candidato (aumente para simular um candidato lento)")
+    parser.add_argument("--steps", type=str, default="5,25,50,100", help="Etapas de tráfego do candidato (%%)")
+    parser.add_argument("--mirror", type=float, default=0, help="Porcentagem espelhada para o candidato antes das etapas")
+    parser.add_argument("--observe-s", type=float, default=6.0, help="Tempo de observação por etapa (s)")
+    parser.add_argument("--checks", type=int, default=2, help="Verificações do SLO por etapa")
+    parser.add_argument("--probe-rps", type=float, default=50.0, help="Requisições de sondagem por segundo e implantação")
+    parser.add_argument("--max-p50-ratio", type=float, default=1.25, help="p50 máximo relativo à implantação atual")
+    parser.add_argument("--max-p99-ratio", type=float, default=1.5, help="p99 máximo relativo à implantação atual")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Taxa de erro máxima do candidato")
+    parser.add_argument("--output", type=str, help="Salva o histórico das verificações em JSON")
+
+    args = parser.parse_args()
+    try:
+        parse_steps(args.steps.split(","))
+    except ValueError as e:
+        parser.error(str(e))
+
+    from score_server import load_model, start_background_server
+
+    incumbent_server, incumbent_url = start_background_server(load_model(args.incumbent_model))
+    candidate_server, candidate_url = start_background_server(load_model(args.candidate_model), window_ms=args.candidate_window_ms)
+    traffic = LocalTraffic({"atual": incumbent_url, "candidata": candidate_url})
+    traffic.set_traffic({"atual": 100})
+    print(f"Roteador local em {traffic.scoring_uri()} (atual: {incumbent_url}, candidata: {candidate_url})")
+
+    policy = CanaryPolicy(
+        steps=args.steps.split(","),
+        mirror_percent=args.mirror,
+        observe_s=args.observe_s,
+        checks_per_step=args.checks,
+        probe_rps=args.probe_rps,
+        slo=SLO(args.max_p50_ratio, args.max_p99_ratio, args.max_error_rate)
+    )
+    try:
+        success, history = canary_rollout(traffic, "atual", "candidata", policy)
+        print(f"Tráfego final: {traffic.get_traffic()} | requisições por implantação: {traffic.requests}")
+    finally:
+        traffic.close()
+        incumbent_server.shutdown()
+        candidate_server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"success": success, "history": history}, f, indent=2, ensure_ascii=False)
+        print(f"Histórico salvo em '{args.output}'")
+    exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# Planejamento de capacidade: mede o servidor de pontuação localmente e recomenda tipo/quantidade de instâncias
+
+import os
+import sys
+import json
+import math
+import time
+import socket
+import argparse
+import subprocess
+
+from load_test import run_benchmark
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Tamanhos aceitos por endpoints online gerenciados: (vCPUs, memória em GB, US$/hora aproximado,
+# pay-as-you-go Linux em eastus2 — use --prices para valores atualizados da sua região)
+INSTANCE_TYPES = {
+    "Standard_DS1_v2": (1, 3.5, 0.073),
+    "Standard_DS2_v2": (2, 7, 0.146),
+    "Standard_DS3_v2": (4, 14, 0.293),
+    "Standard_DS4_v2": (8, 28, 0.585),
+    "Standard_F2s_v2": (2, 4, 0.085),
+    "Standard_F4s_v2": (4, 8, 0.169),
+    "Standard_F8s_v2": (8, 16, 0.338)
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_worker(model_path, port, core=None, window_ms=2.0):
+    """
+    Inicia um score_server.py em um processo próprio, fixado em `core` (Linux), e espera
+    a porta abrir. Um processo equivale a um worker do servidor de inferência na Azure.
+    """
+    def pin():
+        if core is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {core})
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SRC_DIR, "score_server.py"), "--model-path", model_path,
+         "--port", str(port), "--batch-window-ms", str(window_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=pin
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"O servidor de pontuação terminou ao iniciar (código {process.returncode})")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise TimeoutError("O servidor de pontuação não abriu a porta a tempo")
+
+
+def measure_curve(url, levels, duration, rows, payload_format="json"):
+    """
+    Carga fechada em concorrência crescente. Para quando a vazão deixa de crescer
+    (ganho < 5%) depois que a latência já subiu, pois dali em diante só aumenta a fila.
+    """
+    curve = []
+    for concurrency in levels:
+        report = run_benchmark(url, concurrency=concurrency, duration=duration, rows=rows, payload_format=payload_format)
+        latency = report["latency_ms"] or {}
+        point = {
+            "concurrency": concurrency,
+            "throughput_rps": report["throughput_rps"],
+            "p50_ms": latency.get("p50"),
+            "p99_ms": latency.get("p99"),
+            "error_rate": report["error_rate"]
+        }
+        curve.append(point)
+        print(f"  concorrência {concurrency:>4}: {point['throughput_rps']:>8.0f} req/s, "
+              f"p50 {point['p50_ms'] or float('nan'):>7.1f} ms, p99 {point['p99_ms'] or float('nan'):>7.1f} ms")
+        if len(curve) >= 3 and point["throughput_rps"] < curve[-2]["throughput_rps"] * 1.05 \
+                and curve[-2]["throughput_rps"] < curve[-3]["throughput_rps"] * 1.05:
+            break
+    return curve
+
+
+def worker_capacity(curve, slo_p99_ms, network_overhead_ms=0.0, max_error_rate=0.001):
+    """Maior vazão de um worker cujo p99 (somado ao custo de rede estimado) fica dentro do SLO."""
+    valid = [point for point in curve
+             if point["p99_ms"] is not None and point["p99_ms"] + network_overhead_ms <= slo_p99_ms
+             and point["error_rate"] <= max_error_rate]
+    return max(valid, key=lambda point: point["throughput_rps"]) if valid else None
+
+
+def recommend(capacity_rps, target_rps, min_rps=0.0, target_utilization=0.7, min_instances=1, instance_types=None):
+    """
+    Para cada tamanho de instância calcula quantas instâncias atendem `target_rps` com a
+    CPU em `target_utilization` (um worker por vCPU) e ordena pelo custo por hora.
+    """
+    options = []
+    for name, (cores, memory_gb, price) in (instance_types or INSTANCE_TYPES).items():
+        workers = cores
+        per_instance = capacity_rps * workers * target_utilization
+        count = max(min_instances, math.ceil(target_rps / per_instance))
+        options.append({
+            "instance_type": name,
+            "vcpus": cores,
+            "memory_gb": memory_gb,
+            "worker_count": workers,
+            "rps_per_instance": per_instance,
+            "instance_count": count,
+            "min_instances": max(min_instances, math.ceil(min_rps / per_instance)) if min_rps else min_instances,
+            "max_instances": count,
+            "cost_per_hour": count * price
+        })
+    return sorted(options, key=lambda option: (option["cost_per_hour"], option["instance_count"]))
+
+
+def arm_parameters(option):
+    """Sobrescritas de parâmetros do infrastructure/pipeline-completo.json (arquivo de parâmetros ARM)."""
+    return {
+        "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentParameters.json#",
+        "contentVersion": "1.0.0.0",
+        "parameters": {
+            "computeVmSize": {"value": option["instance_type"]},
+            "computeMinNodeCount": {"value": option["min_instances"]},
+            "computeMaxNodeCount": {"value": option["max_instances"]}
+        }
+    }
+
+
+def deploy_arguments(option):
+    return (f"--instance-type {option['instance_type']} --instance-count {option['instance_count']} "
+            f"--worker-count {option['worker_count']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recomenda tamanho e quantidade de instâncias a partir de medições locais")
+    parser.add_argument("--model-path", type=str, default="mlflow_model", help="Modelo a medir (MLflow ou .npz/.json)")
+    parser.add_argument("--target-rps", type=float, required=True, help="Pico de requisições por segundo a atender")
+    parser.add_argument("--min-rps", type=float, default=0.0, help="Carga mínima esperada (define o piso do autoscale)")
+    parser.add_argument("--slo-p99-ms", type=float, default=100.0, help="Latência p99 máxima aceitável (ms)")
+    parser.add_argument("--network-overhead-ms", type=float, default=20.0, help="Latência extra estimada da rede/balanceador da Azure (ms)")
+    parser.add_argument("--target-utilization", type=float, default=0.7, help="Fração da capacidade medida usada por instância")
+    parser.add_argument("--min-instances", type=int, default=1, help="Mínimo de instâncias (use 3 para alta disponibilidade)")
+    parser.add_argument("--levels", type=str, default="1,2,4,8,16,32,64", help="Concorrências testadas")
+    parser.add_argument("--duration", type=float, default=5.0, help="Duração de cada nível de carga (s)")
+    parser.add_argument("--rows", type=int, default=24, help="Linhas por requisição")
+    parser.add_argument("--prices", type=str, help="JSON {tipo: [vCPUs, memória GB, US$/hora]} substituindo a tabela interna")
+    parser.add_argument("--output", type=str, default="capacity_plan.json", help="Relatório completo em JSON")
+    parser.add_argument("--arm-parameters", type=str, help="Salva o arquivo de parâmetros ARM da recomendação")
+
+    args = parser.parse_args()
+
+    instance_types = INSTANCE_TYPES
+    if args.prices:
+        with open(args.prices) as f:
+            instance_types = {name: tuple(values) for name, values in json.load(f).items()}
+
+    # Um worker em um núcleo; o gerador de carga fica nos demais núcleos, se houver
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else [None]
+    server_core = cores[0]
+    if len(cores) > 1:
+        os.sched_setaffinity(0, set(cores[1:]))
+    else:
+        print("Aviso: apenas um núcleo disponível; o gerador de carga divide a CPU com o servidor e a capacidade fica subestimada")
+
+    port = free_port()
+    print(f"Medindo um worker de '{args.model_path}' fixado no núcleo {server_core}...")
+    process = start_worker(args.model_path, port, server_core)
+    try:
+        curve = measure_curve(f"http://127.0.0.1:{port}/score", [int(level) for level in args.levels.split(",")],
+                              args.duration, args.rows)
+    finally:
+        process.terminate()
+        process.wait()
+
+    best = worker_capacity(curve, args.slo_p99_ms, args.network_overhead_ms)
+    report = {"curve": curve, "slo_p99_ms": args.slo_p99_ms, "target_rps": args.target_rps}
+    if best is None:
+        report["recommendation"] = None
+        print(f"\nNenhum nível de carga atende p99 <= {args.slo_p99_ms} ms (com {args.network_overhead_ms} ms de rede); "
+              "otimize o modelo ou relaxe o SLO")
+    else:
+        options = recommend(best["throughput_rps"], args.target_rps, args.min_rps, args.target_utilization,
+                            args.min_instances, instance_types)
+        choice = options[0]
+        report.update({"worker_capacity": best, "options": options, "recommendation": choice})
+
+        print(f"\nCapacidade por worker (núcleo): {best['throughput_rps']:.0f} req/s com p99 de {best['p99_ms']:.1f} ms "
+              f"(concorrência {best['concurrency']})")
+        print(f"\n{'tipo':<18} {'vCPU':>4} {'req/s/inst':>10} {'inst':>5} {'US$/h':>7}")
+        for option in options:
+            print(f"{option['instance_type']:<18} {option['vcpus']:>4} {option['rps_per_instance']:>10.0f} "
+                  f"{option['instance_count']:>5} {option['cost_per_hour']:>7.2f}")
+        print(f"\nRecomendação: {choice['instance_count']}x {choice['instance_type']} "
+              f"(autoscale de {choice['min_instances']} a {choice['max_instances']} instâncias, CPU alvo {args.target_utilization:.0%})")
+        print(f"  python src/deploy_model.py {deploy_arguments(choice)}")
+        if args.arm_parameters:
+            with open(args.arm_parameters, "w") as f:
+                json.dump(arm_parameters(choice), f, indent=4)
+            print(f"  az deployment group create --template-file infrastructure/pipeline-completo.json --parameters @{args.arm_parameters}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRelatório salvo em '{args.output}'")
+    exit(0 if best is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
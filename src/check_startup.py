@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# Verificação de regressão do tempo de importação dos scripts de linha de comando
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pacotes que não podem ser carregados só por importar cada script
+FORBIDDEN = {
+    "deploy_model": ["azure", "pandas", "numpy", "sklearn", "mlflow", "matplotlib", "requests"],
+    "test_endpoint": ["azure", "pandas", "sklearn", "mlflow", "matplotlib", "requests"]
+}
+
+
+def measure_imports(module):
+    """
+    Importa `module` em um processo novo com `-X importtime`.
+    Retorna ({pacote raiz: tempo acumulado em ms}, tempo total do módulo em ms).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    packages = {}
+    total_ms = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        root = name.split(".")[0]
+        # Linhas de pacotes aninhados vêm antes do pai; o cumulativo da raiz já inclui todas
+        if name == root:
+            packages[root] = int(cumulative) / 1000.0
+        if name == module:
+            total_ms = int(cumulative) / 1000.0
+    return packages, total_ms
+
+
+def check(module, budget_ms):
+    """Retorna a lista de problemas encontrados para `module` (vazia se tudo estiver ok)."""
+    packages, total_ms = measure_imports(module)
+    problems = [f"{module} importa '{name}' na carga do módulo" for name in FORBIDDEN[module] if name in packages]
+    if total_ms > budget_ms:
+        problems.append(f"{module} levou {total_ms:.0f} ms para importar (limite: {budget_ms:.0f} ms)")
+    return problems, total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Falha se os scripts voltarem a carregar dependências pesadas na importação")
+    parser.add_argument("--budget-ms", type=float, default=400.0, help="Tempo máximo de importação por script (ms)")
+    parser.add_argument("--modules", type=str, nargs="+", default=sorted(FORBIDDEN), help="Scripts a verificar")
+
+    args = parser.parse_args()
+
+    report = {}
+    failures = []
+    for module in args.modules:
+        problems, total_ms = check(module, args.budget_ms)
+        report[module] = {"import_ms": total_ms, "problems": problems}
+        failures += problems
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if failures:
+        print("\nRegressão no tempo de partida:")
+        for problem in failures:
+            print(f"  - {problem}")
+        exit(1)
+    print("\nTempo de partida dentro do limite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# Gravação em fluxo de blocos de DataFrame em um único arquivo CSV ou Parquet
+
+
+class CSVChunkWriter:
+    """Acrescenta blocos a um CSV, escrevendo o cabeçalho apenas uma vez."""
+
+    def __init__(self, path):
+        self.path = path
+        self._header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class ParquetChunkWriter:
+    """Escreve cada bloco como um row group de um único arquivo Parquet."""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_writer(path):
+    """Escolhe o formato de saída pelo sufixo do arquivo."""
+    if path.endswith(".parquet"):
+        return ParquetChunkWriter(path)
+    return CSVChunkWriter(path)
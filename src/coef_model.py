@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# Artefato compacto (somente coeficientes) do modelo de vendas, carregado sem MLflow/scikit-learn
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+
+FORMAT_VERSION = 1
+
+
+class CoefModel:
+    """
+    Modelo linear reduzido aos seus números: colunas de entrada, coeficientes e intercepto.
+
+    Expõe `predict` e `n_features_in_` como um estimador do scikit-learn, então pode
+    substituir o modelo MLflow no score_server e no batch_score.
+    """
+
+    def __init__(self, coef, intercept, feature_columns=None, model_version=""):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.feature_columns = list(feature_columns or FEATURE_COLUMNS[:len(self.coef)])
+        self.model_version = str(model_version)
+        self.n_features_in_ = len(self.coef)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def save(self, path):
+        """Salva em .json (legível) ou .npz (binário), conforme o sufixo."""
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({
+                    "format_version": FORMAT_VERSION,
+                    "model_version": self.model_version,
+                    "feature_columns": self.feature_columns,
+                    "coef": self.coef.tolist(),
+                    "intercept": self.intercept
+                }, f, indent=2)
+        else:
+            np.savez(
+                path,
+                format_version=FORMAT_VERSION,
+                model_version=self.model_version,
+                feature_columns=np.array(self.feature_columns),
+                coef=self.coef,
+                intercept=self.intercept
+            )
+
+
+def load_coef_model(path):
+    """Carrega um artefato .json ou .npz gerado por CoefModel.save."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            spec = json.load(f)
+    else:
+        with np.load(path, allow_pickle=False) as data:
+            spec = {name: data[name] for name in data.files}
+        spec["feature_columns"] = spec["feature_columns"].tolist()
+        spec["model_version"] = str(spec["model_version"])
+
+    if int(spec["format_version"]) > FORMAT_VERSION:
+        raise ValueError(f"Versão de formato não suportada: {spec['format_version']}")
+    return CoefModel(spec["coef"], spec["intercept"], spec["feature_columns"], spec["model_version"])
+
+
+def _pipeline_steps(model):
+    """Etapas de um Pipeline do scikit-learn, com pipelines aninhados achatados."""
+    if not hasattr(model, "steps"):
+        return [model]
+    return [inner for _, step in model.steps for inner in _pipeline_steps(step)]
+
+
+def linear_terms(model):
+    """
+    Coeficientes sobre [temperatura, temperatura², ...] e intercepto de um modelo linear.
+
+    Além de estimadores lineares simples, aceita os pipelines vencedores do model_search
+    (PolynomialFeatures, StandardScaler opcional e um estimador linear no final): a
+    padronização é incorporada aos coeficientes. Outros modelos geram ValueError.
+    """
+    steps = _pipeline_steps(model)
+    final = steps[-1]
+    if not hasattr(final, "coef_"):
+        raise ValueError(f"O modelo {type(final).__name__} não é linear; não há coeficientes para exportar")
+    coef = np.ravel(final.coef_).astype(np.float64)
+    intercept = float(np.ravel(final.intercept_)[0])
+
+    for position, step in reversed(list(enumerate(steps[:-1]))):
+        name = type(step).__name__
+        if name == "StandardScaler":
+            # w·(x - média)/escala + b  →  (w/escala)·x + (b - (w/escala)·média)
+            if step.with_std:
+                coef = coef / step.scale_
+            if step.with_mean:
+                intercept -= float(coef @ step.mean_)
+        elif name == "PolynomialFeatures" and position == 0:
+            powers = np.ravel(step.powers_)
+            if step.n_features_in_ != 1 or not np.array_equal(powers, np.arange(1, len(powers) + 1)):
+                raise ValueError("Só PolynomialFeatures da temperatura, sem coluna de viés, pode ser exportado")
+        else:
+            raise ValueError(f"A etapa {name} não tem equivalente no artefato de coeficientes")
+
+    if len(coef) > len(FEATURE_COLUMNS):
+        raise ValueError(f"Modelo de grau {len(coef)}: o contrato input_data só tem as colunas {FEATURE_COLUMNS}")
+    return coef, intercept
+
+
+def from_mlflow(model_path, model_version=""):
+    """Extrai os coeficientes de um modelo linear (ou pipeline polinomial) salvo em formato MLflow."""
+    import mlflow.sklearn
+
+    coef, intercept = linear_terms(mlflow.sklearn.load_model(model_path))
+    return CoefModel(coef, intercept, model_version=model_version)
+
+
+def to_mlflow(coef_model, model_path):
+    """Reconstrói um LinearRegression equivalente e o salva em formato MLflow."""
+    import mlflow.sklearn
+    from sklearn.linear_model import LinearRegression
+
+    model = LinearRegression()
+    model.coef_ = coef_model.coef.copy()
+    model.intercept_ = coef_model.intercept
+    model.n_features_in_ = coef_model.n_features_in_
+    mlflow.sklearn.save_model(model, model_path)
+
+
+def measure_startup(model_path, repeats=3):
+    """Tempo (s) de um processo novo até a primeira previsão, carregando o artefato em `model_path`."""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        f"import sys; sys.path.insert(0, {src_dir!r})\n"
+        "from score_server import load_model\n"
+        f"model = load_model({model_path!r})\n"
+        "model.predict([[25.0, 625.0][:model.n_features_in_]])\n"
+    )
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte o modelo de vendas entre MLflow e o formato compacto de coeficientes")
+    parser.add_argument("--from-mlflow", type=str, help="Diretório do modelo MLflow de origem")
+    parser.add_argument("--to-mlflow", type=str, help="Diretório MLflow de destino (a partir de --input)")
+    parser.add_argument("--input", type=str, help="Artefato compacto de origem (.npz/.json)")
+    parser.add_argument("--output", type=str, default="sorvete_model.npz", help="Artefato compacto de destino (.npz/.json)")
+    parser.add_argument("--model-version", type=str, default="", help="Versão registrada do modelo")
+    parser.add_argument("--benchmark-startup", action="store_true", help="Compara o tempo de partida a frio dos dois formatos")
+
+    args = parser.parse_args()
+    # np.savez acrescenta .npz a caminhos sem o sufixo; normaliza antes para getsize e load
+    if not args.output.endswith((".json", ".npz")):
+        args.output += ".npz"
+
+    if args.from_mlflow:
+        try:
+            model = from_mlflow(args.from_mlflow, args.model_version)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            exit(1)
+        model.save(args.output)
+        print(f"Modelo {args.from_mlflow} exportado para {args.output} ({os.path.getsize(args.output)} bytes)")
+    elif args.input and args.to_mlflow:
+        to_mlflow(load_coef_model(args.input), args.to_mlflow)
+        print(f"Modelo {args.input} convertido para MLflow em {args.to_mlflow}")
+
+    if args.benchmark_startup:
+        if not args.from_mlflow:
+            parser.error("--benchmark-startup requer --from-mlflow")
+        report = {
+            "mlflow_s": measure_startup(args.from_mlflow),
+            "coef_s": measure_startup(args.output)
+        }
+        report["speedup"] = report["mlflow_s"] / report["coef_s"]
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,28 @@
 
 import os
 import argparse
-import time
-import pandas as pd
-import numpy as np
-from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
-from azure.ai.ml import MLClient, Input, Output
-from azure.ai.ml.entities import (
-    ManagedOnlineEndpoint,
-    ManagedOnlineDeployment,
-    Model,
-    Environment,
-    CodeConfiguration
-)
+from provisioning import Step, print_timeline, run_steps, wait_for
+from telemetry import setup_tracing, span, traced
 
+# Azure, pandas, NumPy, scikit-learn e MLflow são importados dentro das funções que os
+# usam: `--help` e execuções parciais não pagam pelo carregamento (ver check_startup.py)
+
+def get_entities(ml_client):
+    """
+    Classes de entidade (Model, ManagedOnlineEndpoint, ...) a usar com `ml_client`: as do
+    azure.ai.ml.entities ou, no FakeMLClient, objetos simples que dispensam o SDK.
+    """
+    entities = getattr(ml_client, "entities", None)
+    if entities is None:
+        from azure.ai.ml import entities
+    return entities
+
+@traced("authenticate")
 def authenticate_azure_ml(resource_group, workspace):
     """Autentica com o Azure ML."""
+    from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
+    from azure.ai.ml import MLClient
+    
     try:
         # Tenta usar DefaultAzureCredential (funciona em ambientes automatizados)
         credential = DefaultAzureCredential()
@@ -50,12 +57,12 @@ def create_or_get_endpoint(ml_client, endpoint_name):
     except Exception:
         # Cria um novo endpoint
         print(f"Criando novo endpoint: {endpoint_name}")
-        endpoint = ManagedOnlineEndpoint(
+        endpoint = get_entities(ml_client).ManagedOnlineEndpoint(
             name=endpoint_name,
             description="Endpoint para previsão de vendas de sorvete",
             auth_mode="key"
         )
-        ml_client.online_endpoints.begin_create_or_update(endpoint).result()
+        wait_for(ml_client.online_endpoints.begin_create_or_update(endpoint), f"endpoint {endpoint_name}")
         print(f"Endpoint {endpoint_name} criado com sucesso")
     
     return endpoint
@@ -73,7 +80,7 @@ def register_model(ml_client, model_name, model_path, version=None):
                 pass
         
         # Registra o modelo
-        model = Model(
+        model = get_entities(ml_client).Model(
             name=model_name,
             path=model_path,
             description="Modelo para prever vendas de sorvete baseado na temperatura",
@@ -88,26 +95,44 @@ def register_model(ml_client, model_name, model_path, version=None):
         print(f"Erro ao registrar modelo: {e}")
         return None
 
-def create_deployment(ml_client, endpoint_name, deployment_name, model, instance_type="Standard_DS2_v2"):
-    """Cria uma implantação do modelo no endpoint."""
+def create_deployment(ml_client, endpoint_name, deployment_name, model, instance_type="Standard_DS2_v2", rollout=None,
+                      instance_count=1, worker_count=None):
+    """
+    Cria uma implantação do modelo no endpoint.
+    `instance_type`, `instance_count` e `worker_count` (processos do servidor de
+    inferência por instância) podem vir da recomendação do capacity_planner.py.
+    Sem `rollout`, a implantação recebe 100% do tráfego imediatamente. Com uma
+    canary.CanaryPolicy, o tráfego sobe em etapas enquanto a latência e os erros
+    ficarem dentro do SLO em relação à implantação atual, com rollback automático.
+    """
     try:
         # Define a implantação
-        deployment = ManagedOnlineDeployment(
+        deployment = get_entities(ml_client).ManagedOnlineDeployment(
             name=deployment_name,
             endpoint_name=endpoint_name,
             model=model.id,
             instance_type=instance_type,
-            instance_count=1
+            instance_count=instance_count,
+            environment_variables={"WORKER_COUNT": str(worker_count)} if worker_count else None
         )
         
         # Cria ou atualiza a implantação
-        ml_client.online_deployments.begin_create_or_update(deployment).result()
+        wait_for(ml_client.online_deployments.begin_create_or_update(deployment), f"implantação {deployment_name}")
         print(f"Implantação {deployment_name} criada/atualizada com sucesso")
         
-        # Atualiza o tráfego para o endpoint
+        # Implantação que hoje atende o endpoint (a de maior tráfego), se houver outra
         endpoint = ml_client.online_endpoints.get(endpoint_name)
+        current = {name: percent for name, percent in (endpoint.traffic or {}).items() if percent > 0 and name != deployment_name}
+        if rollout and current:
+            from canary import AzureTraffic, canary_rollout
+            incumbent = max(current, key=current.get)
+            print(f"Iniciando rollout canário de {deployment_name} (implantação atual: {incumbent})")
+            success, _ = canary_rollout(AzureTraffic(ml_client, endpoint_name), incumbent, deployment_name, rollout)
+            return success
+        
+        # Atualiza o tráfego para o endpoint
         endpoint.traffic = {deployment_name: 100}
-        ml_client.online_endpoints.begin_create_or_update(endpoint).result()
+        wait_for(ml_client.online_endpoints.begin_create_or_update(endpoint), "atualização de tráfego")
         print(f"Tráfego atualizado: 100% para {deployment_name}")
         
         return True
@@ -160,141 +185,196 @@ def get_endpoint_details(ml_client, endpoint_name):
 def test_model(endpoint_url, endpoint_key):
     """Testa o modelo implantado com alguns dados."""
     try:
-        import requests
+        from scoring_client import ScoringClient, ScoringError
         
         # Dados de teste
-        test_data = {
-            "input_data": {
-                "columns": ["temperatura", "temperatura_squared"],
-                "data": [
-                    [25.0, 625.0],
-                    [30.0, 900.0],
-                    [35.0, 1225.0]
-                ]
-            }
-        }
+        temperatures = [25.0, 30.0, 35.0]
         
-        # Headers da requisição
-        headers = {
-            "Authorization": f"Bearer {endpoint_key}",
-            "Content-Type": "application/json"
-        }
-        
-        # Fazer a requisição
+        # Mesmo cliente usado para entradas grandes: novas tentativas em 429/503 enquanto a
+        # implantação recém-criada ainda está aquecendo (sessão keep-alive compartilhada por endpoint)
         print("\nTestando o modelo com dados de exemplo...")
-        response = requests.post(endpoint_url, json=test_data, headers=headers)
-        
-        if response.status_code == 200:
-            result = response.json()
-            print("\nResultado da previsão:")
-            predictions = result["result"] if "result" in result else result
-            
-            for i, temp in enumerate([25.0, 30.0, 35.0]):
-                print(f"Temperatura: {temp}°C → Vendas previstas: {predictions[i]:.0f} unidades")
-            
-            return True
-        else:
-            print(f"Erro na requisição: {response.status_code} - {response.text}")
+        try:
+            client = ScoringClient(endpoint_url, endpoint_key=endpoint_key)
+            predictions = client.score(temperatures)
+        except ScoringError as e:
+            print(f"Erro na requisição: {e}")
             return False
+        
+        print("\nResultado da previsão:")
+        for temp, prediction in zip(temperatures, predictions):
+            print(f"Temperatura: {temp}°C → Vendas previstas: {prediction:.0f} unidades")
+        
+        return True
             
     except Exception as e:
         print(f"Erro ao testar o modelo: {e}")
         return False
 
-def create_train_model_if_needed(ml_client, compute_name="cpu-cluster"):
-    """Verifica se existe um modelo treinado ou cria um job de treinamento."""
+def find_existing_model(ml_client, model_name="sorvete-vendas-model"):
+    """Retorna o modelo já registrado com este nome, se houver."""
     try:
-        # Verificar se existe um modelo
-        try:
-            models = list(ml_client.models.list(name="sorvete-vendas-model"))
-            if models:
-                print(f"Modelo existente encontrado: {models[0].name} (versão {models[0].version})")
-                return models[0]
-        except Exception:
-            print("Nenhum modelo existente encontrado")
-        
-        # Verificar se o cluster de computação existe
-        try:
-            compute = ml_client.compute.get(compute_name)
-            print(f"Usando cluster de computação existente: {compute_name}")
-        except Exception:
-            print(f"Criando cluster de computação: {compute_name}")
-            from azure.ai.ml.entities import AmlCompute
-            compute = AmlCompute(
-                name=compute_name,
-                size="Standard_DS3_v2",
-                min_instances=0,
-                max_instances=2,
-                idle_time_before_scale_down=120
-            )
-            ml_client.compute.begin_create_or_update(compute).result()
-        
-        # Verificar/criar o dataset
-        try:
-            datasets = list(ml_client.data.list(name="sorvetes-dataset"))
-            if not datasets:
-                # Gerar dados de exemplo
-                print("Gerando dataset de exemplo...")
-                np.random.seed(42)
-                dates = pd.date_range(start="2023-01-01", periods=100)
-                temperatures = 25 + 5 * np.sin(np.arange(100)/30*np.pi) + np.random.normal(0, 2, 100)
-                temperatures = np.clip(temperatures, 15, 38)
-                sales = 100 + 10 * (temperatures - 20) + np.random.normal(0, 15, 100)
-                sales = np.clip(sales, 10, None).astype(int)
-                
-                df = pd.DataFrame({
-                    "data": dates.strftime("%Y-%m-%d"),
-                    "temperatura": temperatures,
-                    "vendas": sales
-                })
-                
-                df.to_csv("sorvete_ml.csv", index=False)
-                
-                # Registrar o dataset
-                from azure.ai.ml.entities import Data
-                from azure.ai.ml.constants import AssetTypes
-                
-                data_asset = Data(
-                    path="sorvete_ml.csv",
-                    type=AssetTypes.URI_FILE,
-                    description="Dados de vendas de sorvete baseados na temperatura",
-                    name="sorvetes-dataset"
-                )
-                ml_client.data.create_or_update(data_asset)
-                print("Dataset criado e registrado")
-            else:
-                print(f"Dataset existente encontrado: {datasets[0].name}")
-        except Exception as e:
-            print(f"Erro ao verificar/criar dataset: {e}")
-            return None
-        
-        # Criar e executar o job de pipeline
-        print("Criando job de pipeline para treinamento...")
-        
-        # Aqui você precisaria criar um job para o Azure ML, que é mais complexo
-        # do que podemos mostrar aqui. Para simplificar, vamos apenas criar um modelo localmente.
-        print("Para fins de demonstração, criando um modelo simples localmente...")
+        models = list(ml_client.models.list(name=model_name))
+        if models:
+            print(f"Modelo existente encontrado: {models[0].name} (versão {models[0].version})")
+            return models[0]
+    except Exception:
+        pass
+    print("Nenhum modelo existente encontrado")
+    return None
+
+def ensure_compute(ml_client, compute_name="cpu-cluster"):
+    """Obtém o cluster de computação ou o cria."""
+    try:
+        compute = ml_client.compute.get(compute_name)
+        print(f"Usando cluster de computação existente: {compute_name}")
+        return compute
+    except Exception:
+        pass
+    
+    try:
+        print(f"Criando cluster de computação: {compute_name}")
+        compute = get_entities(ml_client).AmlCompute(
+            name=compute_name,
+            size="Standard_DS3_v2",
+            min_instances=0,
+            max_instances=2,
+            idle_time_before_scale_down=120
+        )
+        return wait_for(ml_client.compute.begin_create_or_update(compute), f"cluster {compute_name}")
+    except Exception as e:
+        print(f"Erro ao criar cluster de computação: {e}")
+        return None
+
+def ensure_dataset(ml_client, dataset_name="sorvetes-dataset"):
+    """Registra o dataset de exemplo (sorvete_ml.csv) se ainda não existir."""
+    try:
+        datasets = list(ml_client.data.list(name=dataset_name))
+        if datasets:
+            print(f"Dataset existente encontrado: {datasets[0].name}")
+            return datasets[0]
         
-        # Criar modelo simples
-        from sklearn.linear_model import LinearRegression
-        import joblib
-        import mlflow.sklearn
+        # Gerar dados de exemplo
+        print("Gerando dataset de exemplo...")
+        from synthetic_data import generate_dataframe
+        generate_dataframe(n_days=100, seed=42).to_csv("sorvete_ml.csv", index=False)
         
-        X = temperatures.reshape(-1, 1)
-        y = sales
+        # Registrar o dataset
+        data_asset = get_entities(ml_client).Data(
+            path="sorvete_ml.csv",
+            type="uri_file",  # AssetTypes.URI_FILE
+            description="Dados de vendas de sorvete baseados na temperatura",
+            name=dataset_name
+        )
+        data_asset = ml_client.data.create_or_update(data_asset)
+        print("Dataset criado e registrado")
+        return data_asset
+    except Exception as e:
+        print(f"Erro ao verificar/criar dataset: {e}")
+        return None
+
+def train_local_model(model_dir="mlflow_model"):
+    """
+    Treina o modelo simples localmente e o salva no formato MLflow, junto com as
+    estatísticas suficientes para retreinos incrementais (incremental_train.py).
+    """
+    # Aqui você precisaria criar um job para o Azure ML, que é mais complexo
+    # do que podemos mostrar aqui. Para simplificar, vamos apenas criar um modelo localmente.
+    print("Para fins de demonstração, criando um modelo simples localmente...")
+    
+    # Os mesmos dados (determinísticos) do dataset registrado
+    from synthetic_data import generate_dataframe
+    with span("generate_data"):
+        df = generate_dataframe(n_days=100, seed=42)
+    dates = df["data"].to_numpy()
+    temperatures = df["temperatura"].to_numpy()
+    sales = df["vendas"].to_numpy()
+    
+    # Criar modelo simples
+    from sklearn.linear_model import LinearRegression
+    import mlflow.sklearn
+    
+    X = temperatures.reshape(-1, 1)
+    y = sales
+    with span("fit", rows=len(y)):
         model = LinearRegression().fit(X, y)
-        
-        # Salvar como MLflow
-        os.makedirs("mlflow_model", exist_ok=True)
-        mlflow.sklearn.save_model(model, "mlflow_model")
-        
-        # Registrar o modelo
-        registered_model = register_model(ml_client, "sorvete-vendas-model", "mlflow_model")
-        return registered_model
-        
+    
+    # Salvar como MLflow (save_model exige um diretório novo); só um modelo MLflow anterior é substituído
+    import shutil
+    if os.path.exists(model_dir):
+        if not os.path.exists(os.path.join(model_dir, "MLmodel")) and (not os.path.isdir(model_dir) or os.listdir(model_dir)):
+            raise ValueError(f"'{model_dir}' já existe e não é um modelo MLflow; remova-o ou escolha outro diretório")
+        shutil.rmtree(model_dir)
+    with span("save_model", path=model_dir):
+        mlflow.sklearn.save_model(model, model_dir)
+    
+    from incremental_train import STATS_FILE, IncrementalTrainer
+    trainer = IncrementalTrainer(degree=1)
+    trainer.update(dates, temperatures, sales)
+    trainer.save(os.path.join(model_dir, STATS_FILE))
+    return model_dir
+
+def get_or_train_model(ml_client, model_name="sorvete-vendas-model"):
+    """Usa o modelo registrado ou treina um localmente e o registra."""
+    model = find_existing_model(ml_client, model_name)
+    if model:
+        return model
+    
+    try:
+        model_dir = train_local_model()
     except Exception as e:
-        print(f"Erro ao verificar/criar modelo: {e}")
+        print(f"Erro ao treinar modelo: {e}")
         return None
+    return register_model(ml_client, model_name, model_dir)
+
+def provision(ml_client, args):
+    """
+    Monta o grafo de etapas da implantação e o executa com run_steps. O modelo e o
+    endpoint não dependem um do outro e são criados ao mesmo tempo; a implantação
+    espera os dois. O cluster e o dataset só são preparados quando ainda não há modelo
+    registrado, também em paralelo, e sua falha não invalida a implantação.
+    """
+    existing = None
+    if args.model_path:
+        get_model = lambda results: register_model(ml_client, args.model_name, args.model_path)
+    else:
+        existing = find_existing_model(ml_client, args.model_name)
+        get_model = lambda results: existing or get_or_train_model(ml_client, args.model_name)
+    
+    rollout = None
+    if args.rollout == "canary":
+        from canary import SLO, CanaryPolicy
+        rollout = CanaryPolicy(
+            steps=args.canary_steps.split(","),
+            mirror_percent=args.canary_mirror,
+            observe_s=args.canary_observe_s,
+            slo=SLO(args.slo_p50_ratio, args.slo_p99_ratio, args.slo_max_error_rate)
+        )
+    
+    def deploy(results):
+        return create_deployment(ml_client, args.endpoint_name, args.deployment_name, results["modelo"],
+                                 instance_type=args.instance_type, rollout=rollout,
+                                 instance_count=args.instance_count, worker_count=args.worker_count)
+    
+    def details(results):
+        endpoint_url, endpoint_key = get_endpoint_details(ml_client, args.endpoint_name)
+        return (endpoint_url, endpoint_key) if endpoint_url else None
+    
+    steps = [
+        Step("modelo", get_model),
+        Step("endpoint", lambda results: create_or_get_endpoint(ml_client, args.endpoint_name)),
+        Step("implantacao", deploy, requires=["modelo", "endpoint"]),
+        Step("detalhes", details, requires=["implantacao"])
+    ]
+    if not args.model_path and not existing:
+        # Recursos do treino na Azure; o modelo de demonstração é treinado localmente, então não os espera
+        steps += [
+            Step("computacao", lambda results: ensure_compute(ml_client, args.compute_name), optional=True),
+            Step("dataset", lambda results: ensure_dataset(ml_client), optional=True)
+        ]
+    if not args.skip_test:
+        steps.append(Step("teste", lambda results: test_model(*results["detalhes"]), requires=["detalhes"]))
+    
+    return run_steps(steps, max_workers=1 if args.sequential else None)
 
 def main():
     parser = argparse.ArgumentParser(description="Script para implantar o modelo de previsão de vendas de sorvete")
@@ -304,24 +384,56 @@ def main():
     parser.add_argument("--deployment-name", type=str, default="sorvete-deployment", help="Nome da implantação")
     parser.add_argument("--model-name", type=str, default="sorvete-vendas-model", help="Nome do modelo")
     parser.add_argument("--model-path", type=str, help="Caminho para o modelo (se já existir)")
+    parser.add_argument("--instance-type", type=str, default="Standard_DS2_v2", help="Tamanho das instâncias da implantação")
+    parser.add_argument("--instance-count", type=int, default=1, help="Número de instâncias da implantação")
+    parser.add_argument("--worker-count", type=int, help="Workers do servidor de inferência por instância (WORKER_COUNT)")
+    parser.add_argument("--rollout", type=str, choices=["direct", "canary"], default="direct", help="Troca imediata de tráfego ou rollout canário guiado por SLO")
+    parser.add_argument("--canary-steps", type=str, default="5,25,50,100", help="Etapas de tráfego da nova implantação (%%)")
+    parser.add_argument("--canary-mirror", type=float, default=0, help="Porcentagem de tráfego espelhado antes das etapas")
+    parser.add_argument("--canary-observe-s", type=float, default=60.0, help="Tempo de observação por etapa (s)")
+    parser.add_argument("--slo-p50-ratio", type=float, default=1.25, help="p50 máximo da nova implantação relativo à atual")
+    parser.add_argument("--slo-p99-ratio", type=float, default=1.5, help="p99 máximo da nova implantação relativo à atual")
+    parser.add_argument("--slo-max-error-rate", type=float, default=0.01, help="Taxa de erro máxima da nova implantação")
+    parser.add_argument("--compute-name", type=str, default="cpu-cluster", help="Nome do cluster de computação")
+    parser.add_argument("--sequential", action="store_true", help="Executa as etapas uma de cada vez")
+    parser.add_argument("--skip-test", action="store_true", help="Não testa o endpoint ao final")
+    parser.add_argument("--timings-output", type=str, help="Salva os tempos de cada etapa neste arquivo JSON")
+    parser.add_argument("--trace", type=str, help="Salva os tempos de cada etapa (spans) neste arquivo JSON")
+    parser.add_argument("--simulate", action="store_true", help="Usa um MLClient simulado em memória (sem Azure)")
+    parser.add_argument("--simulate-delays", type=str, help="Atrasos simulados, ex.: compute=30,online_deployments=60")
     
     args = parser.parse_args()
+    if args.rollout == "canary":
+        from canary import parse_steps
+        try:
+            parse_steps(args.canary_steps.split(","))
+        except ValueError as e:
+            parser.error(str(e))
+    setup_tracing(args.trace)
     
-    # Autenticar com o Azure ML
-    ml_client = authenticate_azure_ml(args.resource_group, args.workspace)
+    # Autenticar com o Azure ML (ou usar o cliente simulado)
+    if args.simulate:
+        from fake_ml_client import FakeMLClient, parse_delays
+        ml_client = FakeMLClient(parse_delays(args.simulate_delays))
+        print("Usando MLClient simulado (nenhum recurso da Azure será criado)")
+    else:
+        ml_client = authenticate_azure_ml(args.resource_group, args.workspace)
     if not ml_client:
         print("Falha na autenticação com o Azure ML")
-        return
+        exit(1)
     
-    # Obter ou treinar modelo
-    model = None
-    if args.model_path:
-        model = register_model(ml_client, args.model_name, args.model_path)
-    else:
-        model = create_train_model_if_needed(ml_client)
+    # Modelo, endpoint, implantação e teste, com as etapas independentes em paralelo
+    results, report = provision(ml_client, args)
+    print_timeline(report, output=args.timings_output)
     
-    if not model:
-        print("Falha ao obter/criar modelo")
-        return
-    
-    #
\ No newline at end of file
+    if not report["succeeded"]:
+        failed = [record["name"] for record in report["steps"] if record["status"] != "ok"]
+        print(f"\nFalha na implantação (etapas sem sucesso: {', '.join(failed)})")
+        exit(1)
+    skipped = [record["name"] for record in report["steps"] if record["optional"] and record["status"] != "ok"]
+    if skipped:
+        print(f"\nAviso: etapas opcionais sem sucesso: {', '.join(skipped)}")
+    print("\nImplantação concluída com sucesso!")
+
+if __name__ == "__main__":
+    main()
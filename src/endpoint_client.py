@@ -0,0 +1,146 @@
+# Camada compartilhada de acesso aos endpoints: cache de tokens e sessões HTTP reaproveitadas
+
+import time
+import threading
+from urllib.parse import urlsplit
+
+from telemetry import span
+
+ML_SCOPE = "https://ml.azure.com/.default"
+
+# Endereços do servidor local (score_server.py), que não exige autenticação
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+_token_caches = {}
+_sessions = {}
+_lock = threading.Lock()
+
+
+class TokenCache:
+    """
+    Guarda o token de uma credencial Azure até pouco antes de expirar.
+
+    - Faltando menos de `refresh_margin` segundos, a renovação é síncrona (ninguém
+      recebe um token prestes a vencer).
+    - Faltando menos de `background_margin` segundos, o token atual continua sendo
+      devolvido e uma única thread renova em segundo plano.
+
+    As margens são limitadas a 10% e 50% da validade de cada token, para que tokens de
+    vida curta não sejam renovados a cada chamada.
+
+    `credential` é qualquer objeto com get_token(scope) → (token, expires_on), como as
+    credenciais do azure.identity; por padrão usa DefaultAzureCredential.
+    """
+
+    def __init__(self, scope=ML_SCOPE, credential=None, refresh_margin=60, background_margin=300):
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self.background_margin = background_margin
+        self._credential = credential
+        self._token = None
+        self._margins = (refresh_margin, background_margin)
+        self._lock = threading.Lock()
+        # Fica adquirido enquanto uma renovação em segundo plano está em andamento
+        self._refresh_lock = threading.Lock()
+
+    def _get_credential(self):
+        if self._credential is None:
+            from azure.identity import DefaultAzureCredential
+            self._credential = DefaultAzureCredential()
+        return self._credential
+
+    def _fetch(self):
+        token = self._get_credential().get_token(self.scope)
+        lifetime = max(token.expires_on - time.time(), 0)
+        self._margins = (min(self.refresh_margin, lifetime * 0.1), min(self.background_margin, lifetime * 0.5))
+        self._token = token
+        return token
+
+    def _refresh_in_background(self):
+        try:
+            with self._lock:
+                self._fetch()
+        except Exception as e:
+            print(f"Erro ao renovar token em segundo plano: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def get_token(self):
+        """Retorna a string do token, renovando-o apenas quando necessário."""
+        token = self._token
+        refresh_margin, background_margin = self._margins
+        remaining = token.expires_on - time.time() if token else 0
+        if remaining > refresh_margin:
+            # acquire sem bloqueio: só quem conseguir o lock dispara a renovação
+            if remaining < background_margin and self._refresh_lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh_in_background, name="token-refresh", daemon=True).start()
+            return token.token
+
+        with self._lock:
+            # Outra thread pode ter renovado enquanto esperávamos o lock
+            token = self._token
+            if token is None or token.expires_on - time.time() <= self._margins[0]:
+                token = self._fetch()
+            return token.token
+
+
+def get_token_cache(scope=ML_SCOPE, credential=None):
+    """TokenCache compartilhado por escopo (um novo é criado se `credential` for informado)."""
+    with _lock:
+        cache = _token_caches.get(scope)
+        if cache is None or (credential is not None and cache._credential is not credential):
+            cache = _token_caches[scope] = TokenCache(scope, credential)
+        return cache
+
+
+def is_local(url):
+    return urlsplit(url).hostname in LOCAL_HOSTS
+
+
+def get_auth_header(endpoint_key=None, credential=None, scope=ML_SCOPE, url=None):
+    """
+    Cabeçalho Authorization com a chave do endpoint ou com um token em cache.
+    Sem chave e com `url` local, retorna um cabeçalho vazio (nada de Azure nem login).
+    """
+    if endpoint_key:
+        return {"Authorization": f"Bearer {endpoint_key}"}
+    if url is not None and is_local(url):
+        return {}
+    with span("auth", scope=scope):
+        return {"Authorization": f"Bearer {get_token_cache(scope, credential).get_token()}"}
+
+
+def get_session(url, pool_size=32):
+    """
+    Sessão requests keep-alive compartilhada por endpoint (esquema, host e porta).
+    O pool comporta `pool_size` conexões simultâneas, evitando um handshake TLS por requisição.
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.hostname, parts.port)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def post(url, data, headers, timeout=60):
+    """POST pela sessão compartilhada do endpoint."""
+    with span("http_post", url=url, request_bytes=len(data)) as post_span:
+        response = get_session(url).post(url, data=data, headers=headers, timeout=timeout)
+        post_span.set(status=response.status_code, response_bytes=len(response.content))
+        return response
+
+
+def close_sessions():
+    """Fecha todas as sessões abertas (útil ao final de scripts e testes)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
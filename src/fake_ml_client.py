@@ -0,0 +1,145 @@
+# MLClient simulado, em memória, com atrasos configuráveis: permite exercitar o provisionamento sem a Azure
+
+import time
+import threading
+from types import SimpleNamespace
+
+# Atrasos padrão (s) de cada tipo de operação, na ordem de grandeza das operações reais
+DEFAULT_DELAYS = {
+    "compute": 3.0,
+    "data": 1.0,
+    "models": 1.0,
+    "online_endpoints": 2.0,
+    "online_deployments": 4.0
+}
+
+
+# Entidades usadas pelo deploy_model, como objetos simples (mesmos argumentos das classes de azure.ai.ml.entities)
+ENTITY_NAMES = ["AmlCompute", "Data", "Model", "ManagedOnlineEndpoint", "ManagedOnlineDeployment"]
+ENTITIES = SimpleNamespace(**{name: type(name, (SimpleNamespace,), {}) for name in ENTITY_NAMES})
+
+
+class ResourceNotFoundError(Exception):
+    """Equivalente local do erro que o azure-ai-ml lança para recursos inexistentes."""
+
+
+class FakeOperation:
+    """Imita um LROPoller: termina `delay` segundos após a criação."""
+
+    def __init__(self, delay, finish):
+        self._deadline = time.monotonic() + delay
+        self._finish = finish
+        self._result = None
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def done(self):
+        return time.monotonic() >= self._deadline
+
+    def status(self):
+        return "Succeeded" if self.done() else "Running"
+
+    def result(self, timeout=None):
+        remaining = self._deadline - time.monotonic()
+        if timeout is not None and remaining > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Operação simulada ainda em andamento")
+        if remaining > 0:
+            time.sleep(remaining)
+        with self._lock:
+            if not self._finished:
+                self._result = self._finish()
+                self._finished = True
+        return self._result
+
+
+class FakeOperations:
+    """Grupo de operações (compute, models, ...) guardando os recursos em um dicionário."""
+
+    def __init__(self, kind, delay, client):
+        self.kind = kind
+        self.delay = delay
+        self._client = client
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def _store(self, entity):
+        name = entity.name
+        record = SimpleNamespace(**{key: value for key, value in vars(entity).items() if not key.startswith("_")})
+        record.name = name
+        with self._lock:
+            if self.kind == "models":
+                versions = [version for (item_name, version) in self._items if item_name == name]
+                record.version = str(max((int(version) for version in versions), default=0) + 1)
+                record.id = f"azureml:{name}:{record.version}"
+                self._items[(name, record.version)] = record
+            else:
+                if self.kind == "online_endpoints":
+                    record.scoring_uri = self._client.scoring_uri
+                    record.traffic = dict(getattr(entity, "traffic", None) or {})
+                self._items[name] = record
+        self._client.calls.append((self.kind, "create_or_update", name))
+        return record
+
+    def get(self, name, version=None):
+        self._client.calls.append((self.kind, "get", name))
+        with self._lock:
+            if self.kind == "models":
+                versions = {item_version: item for (item_name, item_version), item in self._items.items() if item_name == name}
+                if version is None and versions:
+                    version = max(versions, key=int)
+                item = versions.get(str(version)) if version is not None else None
+            else:
+                item = self._items.get(name)
+        if item is None:
+            raise ResourceNotFoundError(f"{self.kind}: '{name}' não encontrado")
+        return item
+
+    def list(self, name=None):
+        self._client.calls.append((self.kind, "list", name))
+        with self._lock:
+            items = list(self._items.values())
+        return [item for item in items if name is None or item.name == name]
+
+    def create_or_update(self, entity):
+        time.sleep(self.delay)
+        return self._store(entity)
+
+    def begin_create_or_update(self, entity):
+        return FakeOperation(self.delay, lambda: self._store(entity))
+
+    def get_keys(self, name):
+        self.get(name)
+        return SimpleNamespace(primary_key=f"fake-key-{name}", secondary_key=f"fake-key-2-{name}")
+
+
+class FakeMLClient:
+    """
+    Substituto do azure.ai.ml.MLClient para testes e ensaios offline do deploy_model.
+
+    - `delays`: atraso (s) por grupo de operações (chaves de DEFAULT_DELAYS); cada
+      begin_create_or_update termina após esse tempo, sem bloquear as outras threads.
+    - `scoring_uri`: URL devolvida pelos endpoints (por exemplo um score_server.py local).
+    - `calls` registra cada chamada, para conferir o que o provisionamento fez.
+    - `entities` substitui azure.ai.ml.entities (ver deploy_model.get_entities), então
+      nada do SDK da Azure precisa estar instalado.
+    """
+
+    def __init__(self, delays=None, scoring_uri="http://127.0.0.1:5001/score"):
+        self.delays = dict(DEFAULT_DELAYS, **(delays or {}))
+        self.scoring_uri = scoring_uri
+        self.calls = []
+        self.entities = ENTITIES
+        for kind, delay in self.delays.items():
+            setattr(self, kind, FakeOperations(kind, delay, self))
+
+
+def parse_delays(text):
+    """Converte "compute=30,online_deployments=60" em {"compute": 30.0, "online_deployments": 60.0}."""
+    delays = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        kind, _, seconds = item.partition("=")
+        if kind not in DEFAULT_DELAYS:
+            raise ValueError(f"Operação desconhecida em --simulate-delays: {kind} (use {', '.join(DEFAULT_DELAYS)})")
+        delays[kind] = float(seconds)
+    return delays
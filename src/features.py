@@ -0,0 +1,43 @@
+# Construção das variáveis de entrada do modelo de vendas de sorvete
+
+import numpy as np
+
+# Colunas aceitas no payload "input_data", na ordem em que o modelo as espera
+FEATURE_COLUMNS = ["temperatura", "temperatura_squared"]
+
+
+def build_features(temperatures, n_features=len(FEATURE_COLUMNS)):
+    """Gera a matriz [temperatura, temperatura², ...] com `n_features` colunas."""
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    return np.column_stack([temperatures ** (power + 1) for power in range(n_features)])
+
+
+def select_features(columns, data, n_features):
+    """
+    Monta a matriz de entrada do modelo a partir de colunas nomeadas.
+
+    Se o cliente enviar apenas "temperatura", as potências (temperatura_squared)
+    são calculadas aqui, no servidor. Entradas vazias ou com valores não finitos
+    (NaN, ±inf) geram ValueError.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    if len(data) == 0:
+        raise ValueError("Nenhuma linha para pontuar")
+    if data.shape[1] != len(columns):
+        raise ValueError(f"Esperadas {len(columns)} colunas, recebidas {data.shape[1]}")
+    if not np.isfinite(data).all():
+        raise ValueError("Valores não finitos (NaN ou infinito) na entrada")
+
+    required = FEATURE_COLUMNS[:n_features]
+    if "temperatura" in columns and not all(name in columns for name in required):
+        return build_features(data[:, columns.index("temperatura")], n_features)
+
+    indices = []
+    for name in required:
+        if name not in columns:
+            raise ValueError(f"Coluna obrigatória ausente: {name}")
+        indices.append(columns.index(name))
+    return data[:, indices]
+
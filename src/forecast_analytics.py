@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# Análise vetorizada de grades de previsão: categorias de vendas, temperaturas limiar e sensibilidade à temperatura
+
+import json
+import time
+import argparse
+
+import numpy as np
+
+CATEGORIES = ["Baixa", "Média", "Alta"]
+COLORS = {"Baixa": "blue", "Média": "green", "Alta": "red"}
+
+# Código das previsões fora de qualquer categoria (vendas <= 0, como o primeiro bin de pd.cut)
+UNCATEGORIZED = -1
+
+
+def categorize(predictions, axis=None, quantiles=(25, 75)):
+    """
+    Classifica cada previsão em Baixa/Média/Alta pelos percentis de `quantiles`.
+
+    Equivale a pd.cut(bins=[0, p25, p75, inf], labels=CATEGORIES): (0, p25] é Baixa,
+    (p25, p75] é Média e acima de p75 é Alta. Com `axis` (por exemplo os eixos de
+    temperatura e dia de uma grade loja × temperatura × dia), os limiares são
+    calculados separadamente para cada posição dos eixos restantes.
+
+    Retorna (códigos int8 com 0/1/2 ou UNCATEGORIZED, limiar baixo, limiar alto).
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    low, high = np.percentile(predictions, quantiles, axis=axis, keepdims=axis is not None)
+    codes = (predictions > low).astype(np.int8)
+    codes += predictions > high
+    codes[predictions <= 0] = UNCATEGORIZED
+    return codes, low, high
+
+
+def category_counts(codes):
+    """Número de pontos em cada categoria."""
+    counts = np.bincount(codes[codes != UNCATEGORIZED].ravel(), minlength=len(CATEGORIES))
+    return {category: int(count) for category, count in zip(CATEGORIES, counts)}
+
+
+def threshold_temperatures(temperatures, codes, axis=None):
+    """
+    Maior temperatura com vendas Baixas e menor temperatura com vendas Altas
+    (NaN quando a categoria está vazia). `temperatures` é ajustada ao formato de `codes`.
+    """
+    temperatures = np.broadcast_to(np.asarray(temperatures, dtype=np.float64), codes.shape)
+    low_max = np.max(temperatures, axis=axis, where=codes == 0, initial=-np.inf)
+    high_min = np.min(temperatures, axis=axis, where=codes == 2, initial=np.inf)
+    return np.where(np.isinf(low_max), np.nan, low_max), np.where(np.isinf(high_min), np.nan, high_min)
+
+
+def interpolate_sales(temperatures, predictions, points, axis=-1):
+    """
+    Vendas previstas interpoladas linearmente nas temperaturas `points`.
+
+    - Com dois vetores 1-D, os pontos podem vir em qualquer ordem e repetidos
+      (temperaturas iguais têm as previsões somadas em média antes do np.interp).
+    - Com uma grade N-D, `temperatures` é o eixo 1-D crescente correspondente a `axis`
+      de `predictions`; o resultado tem esse eixo substituído pelos `points`.
+    """
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    predictions = np.asarray(predictions, dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64)
+
+    if predictions.ndim == 1:
+        unique, inverse = np.unique(temperatures, return_inverse=True)
+        mean = np.bincount(inverse, weights=predictions) / np.bincount(inverse)
+        return np.interp(points, unique, mean)
+
+    # Mesmos pesos do np.interp, aplicados de uma vez a todas as linhas da grade
+    right = np.clip(np.searchsorted(temperatures, points), 1, len(temperatures) - 1)
+    left = right - 1
+    weight = np.clip((points - temperatures[left]) / (temperatures[right] - temperatures[left]), 0.0, 1.0)
+    shape = [1] * predictions.ndim
+    shape[axis] = len(points)
+    weight = weight.reshape(shape)
+    return (1 - weight) * np.take(predictions, left, axis=axis) + weight * np.take(predictions, right, axis=axis)
+
+
+def sales_per_degrees(temperatures, predictions, start=20.0, end=25.0, step=5.0, axis=-1):
+    """Variação das vendas a cada `step` °C, estimada entre `start` e `end` por interpolação."""
+    sales = interpolate_sales(temperatures, predictions, [start, end], axis=axis)
+    first, last = np.take(sales, 0, axis=axis), np.take(sales, 1, axis=axis)
+    return (last - first) / (end - start) * step
+
+
+def summarize(temperatures, predictions):
+    """Resumo de uma curva de previsões 1-D, usado no teste do endpoint."""
+    codes, low, high = categorize(predictions)
+    low_temperature, high_temperature = threshold_temperatures(temperatures, codes)
+    return {
+        "codes": codes,
+        "low_threshold": float(low),
+        "high_threshold": float(high),
+        "low_temperature": float(low_temperature),
+        "high_temperature": float(high_temperature),
+        "counts": category_counts(codes),
+        "sales_per_5c": float(sales_per_degrees(temperatures, predictions))
+    }
+
+
+def downsample(n_points, max_points, seed=0):
+    """Índices ordenados de no máximo `max_points` pontos sorteados (todos, se couberem)."""
+    if n_points <= max_points:
+        return np.arange(n_points)
+    return np.sort(np.random.default_rng(seed).choice(n_points, max_points, replace=False))
+
+
+def plot_forecast(temperatures, predictions, codes, output="previsao_vendas.png", max_points=5000):
+    """
+    Gráfico de vendas previstas por temperatura, colorido por categoria, salvo em `output`.
+    Grades grandes são reduzidas a `max_points` pontos sorteados antes de desenhar.
+    """
+    import matplotlib.pyplot as plt
+
+    temperatures = np.broadcast_to(np.asarray(temperatures, dtype=np.float64), codes.shape).ravel()
+    predictions = np.asarray(predictions, dtype=np.float64).ravel()
+    codes = codes.ravel()
+    index = downsample(len(codes), max_points)
+
+    plt.figure(figsize=(12, 6))
+    for code, category in enumerate(CATEGORIES):
+        selected = index[codes[index] == code]
+        plt.scatter(temperatures[selected], predictions[selected], color=COLORS[category], label=category, alpha=0.7)
+
+    title = "Previsão de Vendas de Sorvete por Temperatura"
+    if len(index) < len(codes):
+        title += f" ({len(index)} de {len(codes)} pontos)"
+    plt.title(title)
+    plt.xlabel("Temperatura (°C)")
+    plt.ylabel("Vendas Previstas (unidades)")
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.tight_layout()
+
+    plt.savefig(output)
+    print(f"\nGráfico de previsões salvo como '{output}'")
+
+
+def predict_grid(temperatures, model_path=None, store_model_path=None, n_stores=None):
+    """
+    Prevê as vendas em todas as temperaturas da grade.
+    Com um modelo por loja (multi_store_train), o resultado é loja × temperatura.
+    """
+    from features import build_features
+
+    if store_model_path:
+        from multi_store_train import MultiStoreModel
+
+        model = MultiStoreModel.load(store_model_path)
+        stores = model.store_ids[:n_stores]
+        predictions = model.predict(np.repeat(stores, len(temperatures)), np.tile(temperatures, len(stores)))
+        return predictions.reshape(len(stores), len(temperatures))
+
+    from score_server import load_model
+
+    model = load_model(model_path)
+    return np.asarray(model.predict(build_features(temperatures, model.n_features_in_)), dtype=np.float64)
+
+
+def distribution(values):
+    """Percentis de um array por loja (ignora NaN) para o relatório JSON."""
+    p5, p50, p95 = np.nanpercentile(values, [5, 50, 95])
+    return {"p5": float(p5), "p50": float(p50), "p95": float(p95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analisa uma grade densa de previsões de vendas de sorvete")
+    parser.add_argument("--model-path", type=str, default="mlflow_model", help="Modelo MLflow ou artefato de coeficientes")
+    parser.add_argument("--store-model", type=str, help="Artefato .npz por loja (multi_store_train.py); tem prioridade")
+    parser.add_argument("--stores", type=int, help="Analisa apenas as primeiras N lojas")
+    parser.add_argument("--min-temp", type=float, default=15.0, help="Menor temperatura da grade (°C)")
+    parser.add_argument("--max-temp", type=float, default=38.0, help="Maior temperatura da grade (°C)")
+    parser.add_argument("--step", type=float, default=0.1, help="Passo da grade de temperatura (°C)")
+    parser.add_argument("--output", type=str, default="forecast_summary.json", help="Arquivo JSON com o resumo")
+    parser.add_argument("--plot", type=str, help="Salva o gráfico neste arquivo (requer matplotlib)")
+    parser.add_argument("--max-points", type=int, default=5000, help="Pontos desenhados no gráfico")
+
+    args = parser.parse_args()
+
+    temperatures = np.round(np.arange(args.min_temp, args.max_temp + args.step / 2, args.step), 6)
+    predictions = predict_grid(temperatures, args.model_path, args.store_model, args.stores)
+
+    start = time.perf_counter()
+    if predictions.ndim == 1:
+        summary = summarize(temperatures, predictions)
+        codes = summary.pop("codes")
+    else:
+        # Categorias e limiares por loja: percentis ao longo do eixo de temperatura
+        codes, low, high = categorize(predictions, axis=1)
+        low_temperature, high_temperature = threshold_temperatures(temperatures, codes, axis=1)
+        summary = {
+            "stores": len(predictions),
+            "low_threshold": distribution(low),
+            "high_threshold": distribution(high),
+            "low_temperature": distribution(low_temperature),
+            "high_temperature": distribution(high_temperature),
+            "counts": category_counts(codes),
+            "sales_per_5c": distribution(sales_per_degrees(temperatures, predictions, axis=1))
+        }
+    summary["points"] = int(predictions.size)
+    summary["analysis_s"] = time.perf_counter() - start
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"\nResumo salvo em '{args.output}'")
+
+    if args.plot:
+        plot_forecast(temperatures, predictions, codes, args.plot, args.max_points)
+
+
+if __name__ == "__main__":
+    main()
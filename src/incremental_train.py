@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# Retreinamento incremental do modelo de vendas a partir de estatísticas suficientes
+
+import os
+import shutil
+import argparse
+import tempfile
+from collections import deque
+
+import numpy as np
+
+from features import build_features
+
+STATS_FILE = "sufficient_stats.npz"
+
+
+class SufficientStats:
+    """
+    Estatísticas suficientes de uma regressão linear: contagem, médias e co-momentos
+    centrados (equivalentes a XᵀX, Xᵀy e yᵀy, mas numericamente estáveis).
+
+    Lotes são combinados com a fórmula de Chan et al., então o custo de uma
+    atualização depende apenas do tamanho dos dados novos.
+    """
+
+    def __init__(self, n_features):
+        self.n = 0.0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.cxx = np.zeros((n_features, n_features))
+        self.cxy = np.zeros(n_features)
+        self.cyy = 0.0
+
+    @classmethod
+    def from_data(cls, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        stats = cls(X.shape[1])
+        if len(y) == 0:
+            return stats
+        stats.n = float(len(y))
+        stats.mean_x = X.mean(axis=0)
+        stats.mean_y = float(y.mean())
+        dx = X - stats.mean_x
+        dy = y - stats.mean_y
+        stats.cxx = dx.T @ dx
+        stats.cxy = dx.T @ dy
+        stats.cyy = float(dy @ dy)
+        return stats
+
+    def merge(self, other):
+        """Combina dois conjuntos de estatísticas como se os dados tivessem sido ajustados juntos."""
+        if other.n == 0:
+            return self.scale(1.0)
+        if self.n == 0:
+            return other.scale(1.0)
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+
+        merged = SufficientStats(len(self.mean_x))
+        merged.n = n
+        merged.mean_x = self.mean_x + dx * other.n / n
+        merged.mean_y = self.mean_y + dy * other.n / n
+        merged.cxx = self.cxx + other.cxx + np.outer(dx, dx) * weight
+        merged.cxy = self.cxy + other.cxy + dx * dy * weight
+        merged.cyy = self.cyy + other.cyy + dy * dy * weight
+        return merged
+
+    def scale(self, factor):
+        """Multiplica o peso de todas as observações por `factor` (esquecimento exponencial)."""
+        scaled = SufficientStats(len(self.mean_x))
+        scaled.n = self.n * factor
+        scaled.mean_x = self.mean_x.copy()
+        scaled.mean_y = self.mean_y
+        scaled.cxx = self.cxx * factor
+        scaled.cxy = self.cxy * factor
+        scaled.cyy = self.cyy * factor
+        return scaled
+
+    def solve(self):
+        """Resolve os mínimos quadrados ordinários. Retorna (coeficientes, intercepto)."""
+        if self.n < 2:
+            raise ValueError("Dados insuficientes para ajustar o modelo")
+        coef = np.linalg.lstsq(self.cxx, self.cxy, rcond=None)[0]
+        return coef, self.mean_y - self.mean_x @ coef
+
+    def moments(self):
+        """Média e variância de cada variável de entrada."""
+        return self.mean_x.copy(), np.diag(self.cxx) / self.n if self.n else np.zeros(len(self.mean_x))
+
+    def to_arrays(self):
+        return np.concatenate([[self.n, self.mean_y, self.cyy], self.mean_x, self.cxy, self.cxx.ravel()])
+
+    @classmethod
+    def from_arrays(cls, values, n_features):
+        stats = cls(n_features)
+        stats.n, stats.mean_y, stats.cyy = (float(v) for v in values[:3])
+        offset = 3
+        stats.mean_x = values[offset:offset + n_features].copy()
+        stats.cxy = values[offset + n_features:offset + 2 * n_features].copy()
+        stats.cxx = values[offset + 2 * n_features:].reshape(n_features, n_features).copy()
+        return stats
+
+
+class IncrementalTrainer:
+    """
+    Mantém as estatísticas do histórico de vendas e reajusta a regressão só com os dias novos.
+
+    - Padrão: acumula todo o histórico (mesmo resultado de um reajuste completo).
+    - `window_days`: considera apenas os últimos N dias (guarda as estatísticas por dia).
+    - `decay`: multiplica o peso do histórico por `decay` a cada dia novo.
+
+    Linhas com data menor ou igual à última incorporada em execuções anteriores
+    (`cutoff_date`, fixada por start_run) são ignoradas, o que torna seguro reenviar o
+    dataset completo gerado pelo workflow. Dentro de uma execução, os blocos podem chegar
+    em qualquer ordem no modo padrão; com janela ou decaimento, as datas precisam vir em
+    ordem crescente (um mesmo dia pode continuar no bloco seguinte).
+    """
+
+    def __init__(self, degree=1, window_days=None, decay=None):
+        if window_days and decay:
+            raise ValueError("window_days e decay não podem ser usados juntos")
+        self.degree = degree
+        self.window_days = window_days
+        self.decay = decay
+        self.total = SufficientStats(degree)
+        self.days = deque()
+        self.last_date = ""
+        self.cutoff_date = ""
+
+    def start_run(self):
+        """Marca o início de uma execução: as próximas chamadas a update ignoram só o que já estava incorporado."""
+        self.cutoff_date = self.last_date
+
+    def update(self, dates, temperatures, sales):
+        """Incorpora as linhas novas. Retorna quantas linhas foram usadas."""
+        dates = np.asarray(dates).astype("datetime64[D]")
+        if self.cutoff_date:
+            new = dates > np.datetime64(self.cutoff_date, "D")
+        else:
+            new = np.ones(len(dates), dtype=bool)
+        dates = dates[new]
+        if len(dates) == 0:
+            return 0
+        X = build_features(np.asarray(temperatures)[new], self.degree)
+        y = np.asarray(sales, dtype=np.float64)[new]
+
+        if not self.window_days and not self.decay:
+            self.total = self.total.merge(SufficientStats.from_data(X, y))
+        else:
+            order = np.argsort(dates, kind="stable")
+            unique_dates, starts = np.unique(dates[order], return_index=True)
+            if str(unique_dates[0]) < self.last_date:
+                raise ValueError(f"Dados fora de ordem: {unique_dates[0]} chegou depois de {self.last_date}; "
+                                 "ordene as linhas por data para usar janela ou decaimento")
+            for day, rows in zip(unique_dates, np.split(order, starts[1:])):
+                day_stats = SufficientStats.from_data(X[rows], y[rows])
+                # O mesmo dia pode estar dividido entre dois blocos ou arquivos
+                same_day = str(day) == self.last_date
+                if self.decay:
+                    self.total = (self.total if same_day else self.total.scale(self.decay)).merge(day_stats)
+                elif same_day:
+                    self.days[-1] = (str(day), self.days[-1][1].merge(day_stats))
+                else:
+                    self.days.append((str(day), day_stats))
+                    while len(self.days) > self.window_days:
+                        self.days.popleft()
+                self.last_date = str(day)
+            if self.window_days:
+                self.total = SufficientStats(self.degree)
+                for _, day_stats in self.days:
+                    self.total = self.total.merge(day_stats)
+
+        self.last_date = max(self.last_date, str(dates.max()))
+        return len(y)
+
+    def to_model(self):
+        """Cria um LinearRegression do scikit-learn com os coeficientes resolvidos."""
+        from sklearn.linear_model import LinearRegression
+
+        coef, intercept = self.total.solve()
+        model = LinearRegression()
+        model.coef_ = coef
+        model.intercept_ = float(intercept)
+        model.n_features_in_ = self.degree
+        model.rank_ = self.degree
+        model.singular_ = np.zeros(self.degree)
+        return model
+
+    def save(self, path):
+        day_labels = np.array([day for day, _ in self.days], dtype=str)
+        width = len(self.total.to_arrays())
+        day_values = np.array([stats.to_arrays() for _, stats in self.days]).reshape(len(self.days), width)
+        np.savez(
+            path,
+            degree=self.degree,
+            window_days=self.window_days or 0,
+            decay=self.decay or 0.0,
+            last_date=self.last_date,
+            total=self.total.to_arrays(),
+            day_labels=day_labels,
+            day_values=day_values
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        degree = int(data["degree"])
+        trainer = cls(degree, int(data["window_days"]) or None, float(data["decay"]) or None)
+        trainer.last_date = str(data["last_date"])
+        trainer.start_run()
+        trainer.total = SufficientStats.from_arrays(data["total"], degree)
+        for day, values in zip(data["day_labels"], data["day_values"]):
+            trainer.days.append((str(day), SufficientStats.from_arrays(values, degree)))
+        return trainer
+
+
+def check_model_dir(model_dir):
+    """
+    Garante que `model_dir` pode ser substituído: inexistente, vazio ou com um modelo
+    salvo anteriormente (MLmodel ou estatísticas). Qualquer outro caminho gera ValueError,
+    para que um --model-dir errado não apague dados do usuário.
+    """
+    if not os.path.exists(model_dir):
+        return
+    if os.path.isdir(model_dir):
+        entries = os.listdir(model_dir)
+        if not entries or "MLmodel" in entries or STATS_FILE in entries:
+            return
+    raise ValueError(f"'{model_dir}' já existe e não é um diretório de modelo; escolha outro --model-dir")
+
+
+def save_model_with_stats(trainer, model_dir):
+    """Salva o modelo em formato MLflow com as estatísticas ao lado, trocando o diretório de forma atômica."""
+    import mlflow.sklearn
+
+    check_model_dir(model_dir)
+    # Preparado ao lado do destino, para que os.replace não atravesse sistemas de arquivos
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=os.path.dirname(os.path.abspath(model_dir)))
+    try:
+        path = os.path.join(staging, "model")
+        mlflow.sklearn.save_model(trainer.to_model(), path)
+        trainer.save(os.path.join(path, STATS_FILE))
+        if os.path.exists(model_dir):
+            shutil.rmtree(model_dir)
+        os.replace(path, model_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def load_trainer(model_dir, degree=1, window_days=None, decay=None):
+    """Carrega as estatísticas salvas junto ao modelo, ou inicia um treinador vazio."""
+    path = os.path.join(model_dir, STATS_FILE)
+    if os.path.exists(path):
+        return IncrementalTrainer.load(path)
+    return IncrementalTrainer(degree, window_days, decay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retreinamento incremental do modelo de vendas de sorvete")
+    parser.add_argument("--data", type=str, nargs="+", required=True, help="CSV(s) com colunas data, temperatura e vendas")
+    parser.add_argument("--model-dir", type=str, default="mlflow_model", help="Diretório do modelo MLflow e das estatísticas")
+    parser.add_argument("--degree", type=int, default=1, help="Grau polinomial na temperatura (apenas para um modelo novo)")
+    parser.add_argument("--window-days", type=int, help="Usa apenas os últimos N dias (apenas para um modelo novo)")
+    parser.add_argument("--decay", type=float, help="Fator de esquecimento por dia, ex.: 0.99 (apenas para um modelo novo)")
+    parser.add_argument("--check-refit", type=str, help="CSV com o histórico completo para comparar com um reajuste do zero")
+
+    args = parser.parse_args()
+    if args.window_days and args.decay:
+        parser.error("--window-days e --decay não podem ser usados juntos")
+
+    import pandas as pd
+
+    try:
+        check_model_dir(args.model_dir)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        exit(1)
+
+    trainer = load_trainer(args.model_dir, args.degree, args.window_days, args.decay)
+    trainer.start_run()
+    rows = 0
+    try:
+        for path in args.data:
+            for chunk in pd.read_csv(path, chunksize=1000000):
+                rows += trainer.update(chunk["data"], chunk["temperatura"], chunk["vendas"])
+    except ValueError as e:
+        print(f"Erro: {e}")
+        exit(1)
+
+    if rows == 0:
+        print(f"Nenhuma linha posterior a {trainer.last_date}; modelo mantido")
+        return
+
+    save_model_with_stats(trainer, args.model_dir)
+    coef, intercept = trainer.total.solve()
+    print(f"{rows} linhas novas incorporadas (total ponderado: {trainer.total.n:.0f}, até {trainer.last_date})")
+    print(f"Coeficientes: {np.round(coef, 4).tolist()}, intercepto: {intercept:.4f}")
+
+    if args.check_refit:
+        from sklearn.linear_model import LinearRegression
+
+        history = pd.read_csv(args.check_refit)
+        X = build_features(history["temperatura"], trainer.degree)
+        reference = LinearRegression().fit(X, history["vendas"])
+        difference = np.max(np.abs(np.append(coef - reference.coef_, intercept - reference.intercept_)))
+        print(f"Diferença máxima para o reajuste completo: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# Gerador de carga concorrente para endpoints de pontuação (Azure ML ou servidor local)
+
+import ssl
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from payload_codec import FORMATS, encode_request
+
+# Limites (ms) do histograma de latência; o último balde acumula o restante
+HISTOGRAM_BOUNDS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def build_payload(rows=24, payload_format="json"):
+    """Monta o corpo da requisição com `rows` temperaturas entre 15 e 38°C. Retorna (corpo, content_type)."""
+    return encode_request(np.linspace(15, 38, rows), payload_format)
+
+
+class KeepAliveConnection:
+    """Conexão HTTP/1.1 persistente sobre asyncio, reaberta automaticamente após falhas."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.https = parts.scheme == "https"
+        self.port = parts.port or (443 if self.https else 80)
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        # Cabeçalho Host: porta só quando não é a padrão do esquema; IPv6 entre colchetes
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        self.host_header = host if self.port == (443 if self.https else 80) else f"{host}:{self.port}"
+        self._reader = None
+        self._writer = None
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.https else None
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def post(self, body, headers):
+        """Envia um POST e retorna (status, corpo). Fecha a conexão em caso de erro."""
+        if self._writer is None:
+            await self._connect()
+        lines = [f"POST {self.path} HTTP/1.1", f"Host: {self.host_header}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            await self._writer.drain()
+            return await self._read_response()
+        except Exception:
+            self.close()
+            raise
+
+    async def _read_response(self):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("Conexão encerrada pelo servidor")
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                body += await self._reader.readexactly(size)
+                await self._reader.readline()
+        else:
+            body = await self._reader.readexactly(int(response_headers.get("content-length", 0)))
+
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
+
+
+async def _run(url, headers, body, concurrency, duration, target_rps, request_timeout):
+    latencies = []
+    statuses = {}
+    errors = {}
+    start = time.perf_counter()
+    end = start + duration
+    interval = 1.0 / target_rps if target_rps else 0.0
+    schedule = [start]
+
+    async def worker():
+        connection = KeepAliveConnection(url)
+        try:
+            while True:
+                if interval:
+                    # Agenda global: cada requisição ocupa um slot de 1/rps segundos.
+                    # A latência conta a partir do horário agendado (evita omissão coordenada).
+                    sent_at = schedule[0]
+                    schedule[0] += interval
+                    if sent_at >= end:
+                        return
+                    delay = sent_at - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                else:
+                    sent_at = time.perf_counter()
+                    if sent_at >= end:
+                        return
+
+                try:
+                    status, _ = await asyncio.wait_for(connection.post(body, headers), request_timeout)
+                    statuses[status] = statuses.get(status, 0) + 1
+                except asyncio.TimeoutError:
+                    # A resposta pendente ainda pode chegar: a conexão é descartada e reaberta
+                    status = None
+                    errors["Timeout"] = errors.get("Timeout", 0) + 1
+                    connection.close()
+                except Exception as e:
+                    status = None
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                if status == 200:
+                    latencies.append(time.perf_counter() - sent_at)
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, errors, time.perf_counter() - start
+
+
+def summarize(latencies, statuses, errors, elapsed, rows):
+    """Consolida as medições em um relatório serializável em JSON."""
+    total = sum(statuses.values()) + sum(errors.values())
+    ok = statuses.get(200, 0)
+    latencies_ms = np.asarray(latencies) * 1000.0
+
+    report = {
+        "requests": total,
+        "succeeded": ok,
+        "failed": total - ok,
+        "error_rate": (total - ok) / total if total else 0.0,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "exceptions": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": ok / elapsed if elapsed else 0.0,
+        "rows_per_s": ok * rows / elapsed if elapsed else 0.0,
+        "latency_ms": {},
+        "histogram_ms": {}
+    }
+    if len(latencies_ms):
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        report["latency_ms"] = {
+            "mean": float(latencies_ms.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(latencies_ms.max())
+        }
+        counts = np.bincount(np.searchsorted(HISTOGRAM_BOUNDS_MS, latencies_ms), minlength=len(HISTOGRAM_BOUNDS_MS) + 1)
+        labels = [f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"]
+        report["histogram_ms"] = dict(zip(labels, counts.tolist()))
+    return report
+
+
+def run_benchmark(url, headers=None, concurrency=16, duration=10.0, rows=24, target_rps=None,
+                  payload_format="json", request_timeout=10.0):
+    """
+    Dispara requisições concorrentes contra `url` durante `duration` segundos.
+
+    Cada uma das `concurrency` tarefas mantém sua própria conexão keep-alive.
+    Com `target_rps`, as requisições seguem uma agenda de taxa fixa; sem ele,
+    cada tarefa envia a próxima assim que recebe a resposta (carga fechada).
+    Requisições sem resposta em `request_timeout` segundos contam como erro ("Timeout"),
+    então o teste termina no máximo `request_timeout` depois de `duration`.
+    """
+    body, content_type = build_payload(rows, payload_format)
+    headers = dict(headers or {})
+    headers["Content-Type"] = content_type
+    headers["Accept"] = content_type
+
+    latencies, statuses, errors, elapsed = asyncio.run(
+        _run(url, headers, body, concurrency, duration, target_rps, request_timeout)
+    )
+    report = summarize(latencies, statuses, errors, elapsed, rows)
+    report["config"] = {
+        "url": url,
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "rows_per_request": rows,
+        "target_rps": target_rps,
+        "payload_format": payload_format,
+        "request_bytes": len(body),
+        "request_timeout_s": request_timeout
+    }
+    return report
+
+
+def add_benchmark_arguments(parser):
+    """Registra as opções do modo benchmark em um ArgumentParser existente."""
+    parser.add_argument("--concurrency", type=int, default=16, help="Número de conexões simultâneas")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duração do teste de carga (segundos)")
+    parser.add_argument("--rows", type=int, default=24, help="Linhas por requisição")
+    parser.add_argument("--rps", type=float, help="Taxa alvo de requisições por segundo (padrão: sem limite)")
+    parser.add_argument("--request-timeout", type=float, default=10.0, help="Tempo máximo por requisição (s); excedido conta como erro")
+    parser.add_argument("--benchmark-output", type=str, help="Arquivo JSON para salvar o relatório")
+
+
+def print_report(report, output=None):
+    """Imprime o relatório em JSON e, opcionalmente, salva em arquivo."""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+        print(f"\nRelatório salvo em '{output}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga para endpoints de pontuação")
+    parser.add_argument("--endpoint-url", type=str, required=True, help="URL do endpoint de pontuação")
+    parser.add_argument("--endpoint-key", type=str, help="Chave de API do endpoint (opcional)")
+    parser.add_argument("--format", type=str, choices=sorted(FORMATS), default="json", help="Formato do corpo da requisição")
+    add_benchmark_arguments(parser)
+
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.endpoint_key}"} if args.endpoint_key else {}
+    report = run_benchmark(
+        args.endpoint_url,
+        headers=headers,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        rows=args.rows,
+        target_rps=args.rps,
+        payload_format=args.format,
+        request_timeout=args.request_timeout
+    )
+    print_report(report, args.benchmark_output)
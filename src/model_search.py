@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# Busca local e paralela do melhor modelo de vendas (substitui a rodada de AutoML na Azure)
+
+import os
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Dados compartilhados com os processos do pool, enviados uma única vez pelo initializer
+_shared = {}
+
+
+def feature_transformer(feature_key):
+    """Transformação da temperatura correspondente a uma chave como "poly2" ou "spline6"."""
+    if feature_key.startswith("poly"):
+        from sklearn.preprocessing import PolynomialFeatures
+        return PolynomialFeatures(degree=int(feature_key[4:]), include_bias=False)
+    if feature_key.startswith("spline"):
+        from sklearn.preprocessing import SplineTransformer
+        return SplineTransformer(n_knots=int(feature_key[6:]), degree=3, knots="uniform")
+    raise ValueError(f"Transformação desconhecida: {feature_key}")
+
+
+def make_estimator(kind, params):
+    """Estimador final de um candidato; modelos penalizados recebem padronização antes."""
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if kind == "ols":
+        from sklearn.linear_model import LinearRegression
+        return LinearRegression()
+    if kind == "ridge":
+        from sklearn.linear_model import Ridge
+        return make_pipeline(StandardScaler(), Ridge(**params))
+    if kind == "lasso":
+        from sklearn.linear_model import Lasso
+        return make_pipeline(StandardScaler(), Lasso(max_iter=50000, **params))
+    if kind == "gbr":
+        from sklearn.ensemble import GradientBoostingRegressor
+        return GradientBoostingRegressor(random_state=42, **params)
+    raise ValueError(f"Família desconhecida: {kind}")
+
+
+def default_candidates():
+    """Grade de candidatos: polinômios, penalizações ridge/lasso, splines e gradient boosting."""
+    candidates = []
+    for degree in (1, 2, 3, 4):
+        feature_key = f"poly{degree}"
+        candidates.append((feature_key, "ols", {}))
+        candidates += [(feature_key, "ridge", {"alpha": alpha}) for alpha in (0.1, 1.0, 10.0, 100.0)]
+        candidates += [(feature_key, "lasso", {"alpha": alpha}) for alpha in (0.01, 0.1, 1.0)]
+    for n_knots in (4, 6, 8):
+        candidates += [(f"spline{n_knots}", "ridge", {"alpha": alpha}) for alpha in (0.1, 1.0, 10.0)]
+    for n_estimators in (100, 300):
+        for max_depth in (2, 3):
+            for learning_rate in (0.05, 0.1):
+                params = {"n_estimators": n_estimators, "max_depth": max_depth, "learning_rate": learning_rate}
+                candidates.append(("poly1", "gbr", params))
+    return candidates
+
+
+def candidate_name(feature_key, kind, params):
+    details = ",".join(f"{name}={value}" for name, value in params.items())
+    return f"{feature_key}/{kind}" + (f"({details})" if details else "")
+
+
+def _init_worker(features, y, folds):
+    _shared["features"] = features
+    _shared["y"] = y
+    _shared["folds"] = folds
+
+
+def _evaluate(candidate):
+    """Validação cruzada temporal de um candidato sobre as matrizes pré-calculadas."""
+    feature_key, kind, params = candidate
+    X = _shared["features"][feature_key]
+    y = _shared["y"]
+    rmse, mae, r2 = [], [], []
+    start = time.perf_counter()
+    for train, test in _shared["folds"]:
+        estimator = make_estimator(kind, params).fit(X[train], y[train])
+        error = estimator.predict(X[test]) - y[test]
+        rmse.append(np.sqrt(np.mean(error ** 2)))
+        mae.append(np.mean(np.abs(error)))
+        r2.append(1 - np.sum(error ** 2) / np.sum((y[test] - y[test].mean()) ** 2))
+    return {
+        "name": candidate_name(feature_key, kind, params),
+        "features": feature_key,
+        "family": kind,
+        "params": params,
+        "rmse": float(np.mean(rmse)),
+        "rmse_std": float(np.std(rmse)),
+        "mae": float(np.mean(mae)),
+        "r2": float(np.mean(r2)),
+        "fit_s": time.perf_counter() - start
+    }
+
+
+def search(temperatures, sales, candidates=None, n_splits=5, workers=None):
+    """
+    Avalia todos os candidatos em paralelo e retorna o leaderboard ordenado por RMSE.
+
+    As divisões temporais (TimeSeriesSplit) e as matrizes de cada transformação são
+    calculadas uma vez aqui e entregues a cada processo uma única vez, em vez de
+    serem refeitas para cada candidato.
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+
+    candidates = candidates or default_candidates()
+    temperatures = np.asarray(temperatures, dtype=np.float64).reshape(-1, 1)
+    y = np.asarray(sales, dtype=np.float64)
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(temperatures))
+    features = {
+        key: feature_transformer(key).fit_transform(temperatures)
+        for key in sorted({feature_key for feature_key, _, _ in candidates})
+    }
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features, y, folds)) as pool:
+        results = list(pool.map(_evaluate, candidates))
+    return sorted(results, key=lambda result: result["rmse"])
+
+
+def build_final_model(result, temperatures, sales):
+    """Reajusta o vencedor em todos os dados como um Pipeline que recebe só a temperatura."""
+    from sklearn.pipeline import make_pipeline
+
+    model = make_pipeline(feature_transformer(result["features"]), make_estimator(result["family"], result["params"]))
+    return model.fit(np.asarray(temperatures, dtype=np.float64).reshape(-1, 1), np.asarray(sales, dtype=np.float64))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca local do melhor modelo de vendas de sorvete")
+    parser.add_argument("--data", type=str, default="data/sorvetes.csv", help="CSV com colunas data, temperatura e vendas")
+    parser.add_argument("--n-splits", type=int, default=5, help="Dobras da validação cruzada temporal")
+    parser.add_argument("--workers", type=int, help="Processos em paralelo (padrão: todos os núcleos)")
+    parser.add_argument("--leaderboard", type=str, default="leaderboard.json", help="Arquivo JSON do leaderboard")
+    parser.add_argument("--model-dir", type=str, default="model_search_best", help="Diretório MLflow do modelo vencedor (substituído)")
+    parser.add_argument("--top", type=int, default=10, help="Quantos candidatos exibir")
+
+    args = parser.parse_args()
+
+    from incremental_train import check_model_dir
+    try:
+        # Antes da busca: o diretório do vencedor é substituído, então não pode ser um diretório qualquer
+        check_model_dir(args.model_dir)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        exit(1)
+
+    import pandas as pd
+
+    df = pd.read_csv(args.data).sort_values("data")
+    start = time.perf_counter()
+    leaderboard = search(df["temperatura"], df["vendas"], n_splits=args.n_splits, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(leaderboard)} candidatos avaliados em {elapsed:.1f}s\n")
+    print(f"{'#':>3}  {'candidato':<50} {'RMSE':>8} {'MAE':>8} {'R²':>7}")
+    for position, result in enumerate(leaderboard[:args.top], start=1):
+        print(f"{position:>3}  {result['name']:<50} {result['rmse']:>8.2f} {result['mae']:>8.2f} {result['r2']:>7.3f}")
+
+    with open(args.leaderboard, "w") as f:
+        json.dump(leaderboard, f, indent=2)
+    print(f"\nLeaderboard salvo em '{args.leaderboard}'")
+
+    import mlflow.sklearn
+
+    best = leaderboard[0]
+    model = build_final_model(best, df["temperatura"], df["vendas"])
+    if os.path.exists(args.model_dir):
+        shutil.rmtree(args.model_dir)
+    mlflow.sklearn.save_model(model, args.model_dir)
+    print(f"Modelo vencedor ({best['name']}) salvo em '{args.model_dir}'")
+
+
+if __name__ == "__main__":
+    main()
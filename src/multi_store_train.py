@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# Treinamento vetorizado de um modelo temperatura→vendas por loja
+
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import build_features
+
+
+def fit_linear_per_store(stores, temperatures, sales, degree=1):
+    """
+    Ajusta uma regressão linear por loja em uma única passada NumPy.
+
+    As médias e os co-momentos centrados de cada loja são acumulados com
+    np.bincount, e todos os sistemas normais (S × p × p) são resolvidos juntos
+    com uma pseudo-inversa em lote — lojas com poucos dias não quebram o ajuste.
+    Retorna um MultiStoreModel.
+    """
+    store_ids, codes = np.unique(np.asarray(stores), return_inverse=True)
+    codes = codes.ravel()
+    n_stores = len(store_ids)
+    X = build_features(temperatures, degree)
+    y = np.asarray(sales, dtype=np.float64)
+
+    counts = np.bincount(codes, minlength=n_stores).astype(np.float64)
+    mean_x = np.column_stack([np.bincount(codes, X[:, j], n_stores) for j in range(degree)]) / counts[:, None]
+    mean_y = np.bincount(codes, y, n_stores) / counts
+
+    dx = X - mean_x[codes]
+    dy = y - mean_y[codes]
+    cxx = np.empty((n_stores, degree, degree))
+    for i in range(degree):
+        for j in range(i, degree):
+            cxx[:, i, j] = cxx[:, j, i] = np.bincount(codes, dx[:, i] * dx[:, j], n_stores)
+    cxy = np.column_stack([np.bincount(codes, dx[:, j] * dy, n_stores) for j in range(degree)])
+
+    coef = (np.linalg.pinv(cxx) @ cxy[:, :, None])[:, :, 0]
+    intercept = mean_y - np.einsum("sp,sp->s", mean_x, coef)
+    return MultiStoreModel(store_ids, coef, intercept, degree, counts.astype(np.int64))
+
+
+class MultiStoreModel:
+    """Coeficientes de todas as lojas em arrays contíguos, com previsão vetorizada por id de loja."""
+
+    def __init__(self, store_ids, coef, intercept, degree, n_obs=None):
+        order = np.argsort(store_ids)
+        self.store_ids = np.asarray(store_ids)[order]
+        self.coef = np.asarray(coef, dtype=np.float64)[order]
+        self.intercept = np.asarray(intercept, dtype=np.float64)[order]
+        self.degree = int(degree)
+        self.n_obs = None if n_obs is None else np.asarray(n_obs)[order]
+
+    def store_index(self, stores):
+        """Posição de cada loja nos arrays de coeficientes; lojas desconhecidas geram KeyError."""
+        stores = np.asarray(stores)
+        index = np.searchsorted(self.store_ids, stores)
+        index = np.minimum(index, len(self.store_ids) - 1)
+        unknown = self.store_ids[index] != stores
+        if unknown.any():
+            raise KeyError(f"Lojas sem modelo: {np.unique(stores[unknown])[:10].tolist()}")
+        return index
+
+    def predict(self, stores, temperatures):
+        """Prevê as vendas de cada par (loja, temperatura)."""
+        index = self.store_index(np.broadcast_to(stores, np.shape(temperatures)))
+        X = build_features(temperatures, self.degree)
+        return np.einsum("np,np->n", X, self.coef[index]) + self.intercept[index]
+
+    def save(self, path):
+        np.savez(
+            path,
+            store_ids=self.store_ids,
+            coef=self.coef,
+            intercept=self.intercept,
+            degree=self.degree,
+            n_obs=self.n_obs if self.n_obs is not None else np.zeros(len(self.store_ids), dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        return cls(data["store_ids"], data["coef"], data["intercept"], int(data["degree"]), data["n_obs"])
+
+
+def make_estimator(kind):
+    """Modelos não lineares suportados pelo caminho com pool de processos."""
+    if kind == "gbr":
+        from sklearn.ensemble import GradientBoostingRegressor
+        return GradientBoostingRegressor(n_estimators=100, random_state=42)
+    if kind == "rf":
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(n_estimators=100, random_state=42)
+    raise ValueError(f"Modelo desconhecido: {kind}")
+
+
+def _fit_store_group(kind, degree, groups):
+    models = {}
+    for store, temperatures, sales in groups:
+        models[store] = make_estimator(kind).fit(build_features(temperatures, degree), sales)
+    return models
+
+
+def fit_nonlinear_per_store(stores, temperatures, sales, kind="gbr", degree=1, workers=None, stores_per_task=64):
+    """
+    Ajusta um modelo não linear por loja distribuindo grupos de lojas em um pool de processos.
+    Retorna um dicionário {loja: estimador}.
+    """
+    stores = np.asarray(stores)
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    sales = np.asarray(sales, dtype=np.float64)
+    order = np.argsort(stores, kind="stable")
+    store_ids, starts = np.unique(stores[order], return_index=True)
+    groups = [
+        (store, temperatures[rows], sales[rows])
+        for store, rows in zip(store_ids.tolist(), np.split(order, starts[1:]))
+    ]
+
+    models = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = [
+            pool.submit(_fit_store_group, kind, degree, groups[i:i + stores_per_task])
+            for i in range(0, len(groups), stores_per_task)
+        ]
+        for task in tasks:
+            models.update(task.result())
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina um modelo de vendas por loja a partir de uma tabela longa")
+    parser.add_argument("--data", type=str, required=True, help="CSV/Parquet com colunas loja, data, temperatura e vendas")
+    parser.add_argument("--output", type=str, default="lojas_model.npz", help="Arquivo do artefato gerado")
+    parser.add_argument("--store-column", type=str, default="loja", help="Nome da coluna com o id da loja")
+    parser.add_argument("--degree", type=int, default=1, help="Grau polinomial na temperatura")
+    parser.add_argument("--model", type=str, choices=["linear", "gbr", "rf"], default="linear", help="Família de modelo")
+    parser.add_argument("--workers", type=int, help="Processos para modelos não lineares (padrão: todos os núcleos)")
+
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    columns = [args.store_column, "temperatura", "vendas"]
+    if args.data.endswith(".parquet"):
+        df = pd.read_parquet(args.data, columns=columns)
+    else:
+        df = pd.read_csv(args.data, usecols=columns)
+
+    start = time.perf_counter()
+    if args.model == "linear":
+        model = fit_linear_per_store(df[args.store_column].to_numpy(), df["temperatura"].to_numpy(), df["vendas"].to_numpy(), args.degree)
+        model.save(args.output)
+        n_stores = len(model.store_ids)
+    else:
+        import joblib
+
+        models = fit_nonlinear_per_store(
+            df[args.store_column].to_numpy(), df["temperatura"].to_numpy(), df["vendas"].to_numpy(),
+            kind=args.model, degree=args.degree, workers=args.workers
+        )
+        joblib.dump({"degree": args.degree, "models": models}, args.output)
+        n_stores = len(models)
+    elapsed = time.perf_counter() - start
+
+    print(f"{n_stores} lojas treinadas ({len(df)} linhas) em {elapsed:.2f}s → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
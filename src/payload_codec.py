@@ -0,0 +1,131 @@
+# Formatos de requisição/resposta do endpoint de pontuação: JSON e binários compactos
+
+import io
+import json
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+
+JSON = "application/json"
+FLOAT32 = "application/octet-stream"
+NPY = "application/x-npy"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Nomes curtos usados nas CLIs
+FORMATS = {
+    "json": JSON,
+    "json-temp": JSON,
+    "float32": FLOAT32,
+    "npy": NPY,
+    "arrow": ARROW
+}
+
+
+def media_type(header):
+    """Extrai o tipo de mídia de um cabeçalho Content-Type/Accept ("application/json; charset=utf-8")."""
+    return (header or JSON).split(";")[0].strip().lower()
+
+
+def negotiate(content_type, accept=None):
+    """Formato da resposta: o pedido em Accept, se suportado; senão, o mesmo da requisição."""
+    for candidate in (accept or "").split(","):
+        candidate = media_type(candidate)
+        if candidate in (JSON, FLOAT32, NPY, ARROW):
+            return candidate
+    return media_type(content_type)
+
+
+def encode_request(temperatures, fmt="json"):
+    """
+    Serializa temperaturas para envio. Retorna (corpo, content_type).
+
+    "json" mantém o contrato original com temperatura e temperatura_squared (compatível
+    com o endpoint do Azure ML); os demais formatos enviam só a temperatura e deixam o
+    servidor derivar as potências.
+    """
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    if fmt == "json":
+        data = np.column_stack([temperatures, temperatures ** 2]).tolist()
+        body = {"input_data": {"columns": FEATURE_COLUMNS, "data": data}}
+        return json.dumps(body).encode("utf-8"), JSON
+    if fmt == "json-temp":
+        body = {"input_data": {"columns": ["temperatura"], "data": temperatures.tolist()}}
+        return json.dumps(body).encode("utf-8"), JSON
+    if fmt == "float32":
+        return temperatures.astype("<f4").tobytes(), FLOAT32
+    if fmt == "npy":
+        buffer = io.BytesIO()
+        np.save(buffer, temperatures.astype("<f4"), allow_pickle=False)
+        return buffer.getvalue(), NPY
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        return _arrow_bytes(pa.table({"temperatura": temperatures})), ARROW
+    raise ValueError(f"Formato desconhecido: {fmt}")
+
+
+def decode_request(body, content_type):
+    """Desserializa o corpo recebido em (colunas, matriz de dados)."""
+    content_type = media_type(content_type)
+    if content_type == JSON:
+        input_data = json.loads(body)["input_data"]
+        columns = input_data.get("columns", FEATURE_COLUMNS)
+        return columns, np.asarray(input_data["data"], dtype=np.float64)
+    if content_type == FLOAT32:
+        return ["temperatura"], np.frombuffer(body, dtype="<f4").astype(np.float64)
+    if content_type == NPY:
+        data = np.load(io.BytesIO(body), allow_pickle=False).astype(np.float64)
+        columns = ["temperatura"] if data.ndim == 1 else FEATURE_COLUMNS[:data.shape[1]]
+        return columns, data
+    if content_type == ARROW:
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(body).read_all()
+        data = np.column_stack([table.column(name).to_numpy() for name in table.column_names])
+        return table.column_names, data.astype(np.float64)
+    raise ValueError(f"Content-Type não suportado: {content_type}")
+
+
+def encode_response(predictions, content_type):
+    """Serializa as previsões no formato negociado."""
+    predictions = np.asarray(predictions, dtype=np.float64)
+    content_type = media_type(content_type)
+    if content_type == FLOAT32:
+        return predictions.astype("<f4").tobytes()
+    if content_type == NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, predictions.astype("<f4"), allow_pickle=False)
+        return buffer.getvalue()
+    if content_type == ARROW:
+        import pyarrow as pa
+
+        return _arrow_bytes(pa.table({"result": predictions}))
+    return json.dumps({"result": predictions.tolist()}).encode("utf-8")
+
+
+def decode_response(body, content_type):
+    """Desserializa a resposta do endpoint em um array de previsões."""
+    content_type = media_type(content_type)
+    if content_type == FLOAT32:
+        return np.frombuffer(body, dtype="<f4").astype(np.float64)
+    if content_type == NPY:
+        return np.load(io.BytesIO(body), allow_pickle=False).astype(np.float64)
+    if content_type == ARROW:
+        import pyarrow as pa
+
+        return pa.ipc.open_stream(body).read_all().column("result").to_numpy()
+
+    result = json.loads(body)
+    if isinstance(result, dict) and "result" in result:
+        result = result["result"]
+    return np.asarray(result, dtype=np.float64)
+
+
+def _arrow_bytes(table):
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
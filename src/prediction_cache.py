@@ -0,0 +1,120 @@
+# Cache de previsões por temperatura quantizada para o caminho de pontuação
+
+import threading
+from itertools import compress
+from collections import OrderedDict
+
+import numpy as np
+
+from features import build_features
+
+
+class PredictionCache:
+    """
+    Envolve um modelo com um cache de previsões chaveado por (versão do modelo, temperatura quantizada).
+
+    Só a temperatura (primeira coluna) é arredondada para `resolution` (0,1°C por
+    padrão); as demais colunas (temperatura_squared) são recalculadas a partir dela com
+    build_features, como no payload padrão. Assim a mesma chave sempre produz a mesma
+    previsão, qualquer que seja o modo. Linhas com valores não finitos geram ValueError.
+    Dois modos:
+
+    - "lru": dicionário limitado a `max_entries` chaves, preenchido sob demanda;
+    - "table": tabela densa pré-calculada para temperaturas em `table_range`; linhas
+      fora da faixa vão direto ao modelo.
+
+    Em ambos os modos os acertos são resolvidos de forma vetorizada e todas as faltas
+    de um lote seguem em uma única chamada a `model.predict`.
+    """
+
+    def __init__(self, model, model_version="local", mode="lru", resolution=0.1, max_entries=100000,
+                 table_range=(15, 38)):
+        if mode not in ("lru", "table"):
+            raise ValueError(f"Modo de cache desconhecido: {mode}")
+        self.model = model
+        self.model_version = str(model_version)
+        self.mode = mode
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self.n_features_in_ = getattr(model, "n_features_in_", 1)
+        self.hits = 0
+        self.misses = 0
+        self.model_calls = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        if mode == "table":
+            low, high = (int(round(bound / resolution)) for bound in table_range)
+            self._table_offset = low
+            self._table = self._predict_model(np.arange(low, high + 1))
+
+    def _predict_model(self, quantized):
+        """Consulta o modelo com as temperaturas quantizadas e as potências derivadas delas."""
+        self.model_calls += 1
+        features = build_features(quantized * self.resolution, self.n_features_in_)
+        return np.asarray(self.model.predict(features), dtype=np.float64).ravel()
+
+    def _quantize(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        if not np.isfinite(features).all():
+            raise ValueError("Valores não finitos (NaN ou infinito) na entrada")
+        temperatures = features[:, 0] if features.ndim == 2 else features
+        return np.rint(temperatures / self.resolution).astype(np.int64)
+
+    def predict(self, features):
+        """Retorna as previsões para `features`, consultando o modelo apenas nas faltas."""
+        with self._lock:
+            if self.mode == "table":
+                return self._predict_table(features)
+            return self._predict_lru(features)
+
+    def _predict_table(self, features):
+        quantized = self._quantize(features)
+        index = quantized - self._table_offset
+        in_range = (index >= 0) & (index < len(self._table))
+        predictions = np.empty(len(index), dtype=np.float64)
+        predictions[in_range] = self._table[index[in_range]]
+
+        n_hits = int(in_range.sum())
+        if n_hits < len(index):
+            predictions[~in_range] = self._predict_model(quantized[~in_range])
+        self.hits += n_hits
+        self.misses += len(index) - n_hits
+        return predictions
+
+    def _predict_lru(self, features):
+        quantized = self._quantize(features)
+        unique_temps, inverse = np.unique(quantized, return_inverse=True)
+        inverse = inverse.ravel()
+
+        # Só a consulta ao dicionário é por chave; máscaras, previsões e contagens são vetorizadas
+        keys = [(self.model_version, temp) for temp in unique_temps.tolist()]
+        cached = [self._entries.get(key) for key in keys]
+        missing = np.fromiter((value is None for value in cached), dtype=bool, count=len(keys))
+        values = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+
+        for key in compress(keys, ~missing):
+            self._entries.move_to_end(key)
+        if missing.any():
+            values[missing] = self._predict_model(unique_temps[missing])
+            self._entries.update(zip(compress(keys, missing), values[missing].tolist()))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        missed_rows = int(missing[inverse].sum())
+        self.hits += len(quantized) - missed_rows
+        self.misses += missed_rows
+        return values[inverse]
+
+    def stats(self):
+        """Contadores de uso do cache."""
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "model_version": self.model_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "model_calls": self.model_calls,
+            "entries": len(self._table) if self.mode == "table" else len(self._entries)
+        }
@@ -0,0 +1,164 @@
+# Orquestração de etapas de provisionamento com dependências, execução concorrente e tempos por etapa
+
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from telemetry import span
+
+
+class Step:
+    """
+    Etapa do provisionamento. `func(results)` recebe o dicionário com o resultado de
+    todas as etapas já concluídas; `requires` lista as etapas que precisam terminar antes.
+    Como nos scripts de implantação, retornar None/False (ou lançar exceção) é falha.
+    A falha de uma etapa `optional` aparece no relatório, mas não torna o provisionamento malsucedido.
+    """
+
+    def __init__(self, name, func, requires=(), optional=False):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.optional = optional
+
+
+def wait_for(operation, label, poll_interval=5.0, timeout=None):
+    """
+    Acompanha uma operação longa (LROPoller do azure-ai-ml) consultando `done()` em
+    intervalos que começam em 0,5 s e dobram até `poll_interval`, com mensagens de
+    progresso, e retorna `result()`. Cada etapa roda em sua própria thread, então a
+    espera não segura as demais.
+    """
+    with span("wait_operation", label=label):
+        return _poll(operation, label, poll_interval, timeout)
+
+
+def _poll(operation, label, poll_interval, timeout):
+    start = time.monotonic()
+    next_report = start + 30.0
+    interval = min(0.5, poll_interval)
+    while not operation.done():
+        now = time.monotonic()
+        if timeout is not None and now - start > timeout:
+            raise TimeoutError(f"{label}: operação não terminou em {timeout:.0f}s")
+        if now >= next_report:
+            print(f"  ... {label} em andamento ({now - start:.0f}s)")
+            next_report = now + 30.0
+        time.sleep(interval)
+        interval = min(interval * 2, poll_interval)
+    return operation.result()
+
+
+def _validate(steps):
+    names = [step.name for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError("Nomes de etapa repetidos")
+    for step in steps:
+        missing = [name for name in step.requires if name not in names]
+        if missing:
+            raise ValueError(f"Etapa '{step.name}' depende de etapas inexistentes: {missing}")
+
+    # Ordenação topológica apenas para recusar ciclos antes de começar
+    pending = {step.name: set(step.requires) for step in steps}
+    while pending:
+        ready = [name for name, requires in pending.items() if not requires]
+        if not ready:
+            raise ValueError(f"Dependências circulares entre as etapas: {sorted(pending)}")
+        for name in ready:
+            del pending[name]
+        for requires in pending.values():
+            requires.difference_update(ready)
+
+
+def run_steps(steps, max_workers=None):
+    """
+    Executa as etapas assim que suas dependências terminam, com até `max_workers`
+    em paralelo (1 reproduz a execução sequencial). Etapas cujas dependências
+    falharam são puladas.
+
+    Retorna (resultados por etapa, relatório com status e tempos de cada etapa).
+    """
+    _validate(steps)
+    by_name = {step.name: step for step in steps}
+    results = {}
+    records = {step.name: {"name": step.name, "requires": list(step.requires), "optional": step.optional, "status": "pending"}
+               for step in steps}
+    lock = threading.Lock()
+    origin = time.monotonic()
+
+    def execute(step):
+        record = records[step.name]
+        record["start_s"] = time.monotonic() - origin
+        try:
+            with lock:
+                inputs = dict(results)
+            with span(f"step:{step.name}"):
+                value = step.func(inputs)
+            ok = value is not None and value is not False
+            if not ok:
+                record["error"] = "etapa retornou sem resultado"
+        except Exception as e:
+            print(f"Erro na etapa '{step.name}': {e}")
+            value, ok = None, False
+            record["error"] = str(e)
+        record["end_s"] = time.monotonic() - origin
+        record["duration_s"] = record["end_s"] - record["start_s"]
+        return value, ok
+
+    workers = max_workers or len(steps)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provisioning") as pool:
+        running = {}
+        while True:
+            for name, record in records.items():
+                if record["status"] != "pending":
+                    continue
+                statuses = [records[dependency]["status"] for dependency in by_name[name].requires]
+                if any(status in ("failed", "skipped") for status in statuses):
+                    record["status"] = "skipped"
+                    print(f"Etapa '{name}' pulada (dependência falhou)")
+                elif all(status == "ok" for status in statuses):
+                    record["status"] = "running"
+                    # Copia o contexto para que os spans da etapa fiquem sob o span de quem chamou
+                    running[pool.submit(contextvars.copy_context().run, execute, by_name[name])] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                value, ok = future.result()
+                records[name]["status"] = "ok" if ok else "failed"
+                if ok:
+                    with lock:
+                        results[name] = value
+
+    executed = [record for record in records.values() if "duration_s" in record]
+    report = {
+        "wall_s": time.monotonic() - origin,
+        "sequential_s": sum(record["duration_s"] for record in executed),
+        "succeeded": all(record["status"] == "ok" for record in records.values() if not record["optional"]),
+        "steps": list(records.values())
+    }
+    return results, report
+
+
+def print_timeline(report, width=40, output=None):
+    """Mostra o tempo de cada etapa como uma linha do tempo em texto e, opcionalmente, salva o relatório em JSON."""
+    wall = report["wall_s"] or 1.0
+    print("\n==== Tempos do provisionamento ====")
+    for record in sorted(report["steps"], key=lambda record: record.get("start_s", float("inf"))):
+        if "duration_s" not in record:
+            print(f"{record['name']:<14} {'':>8}  {record['status']}")
+            continue
+        offset = int(record["start_s"] / wall * width)
+        length = max(1, int(record["duration_s"] / wall * width))
+        bar = " " * offset + "█" * length
+        print(f"{record['name']:<14} {record['duration_s']:>7.1f}s  |{bar:<{width}}| {record['status']}")
+    saved = report["sequential_s"] - report["wall_s"]
+    print(f"Total: {report['wall_s']:.1f}s (sequencial seria {report['sequential_s']:.1f}s, economia de {saved:.1f}s)")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Relatório de tempos salvo em '{output}'")
@@ -0,0 +1,155 @@
+# Cache em disco, endereçado por conteúdo, das previsões de cada bloco de entrada
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos, a remoção de arquivos continua segura
+    fcntl = None
+
+RUNS_FILE = "runs.jsonl"
+
+
+def model_fingerprint(model_path):
+    """Hash do conteúdo do artefato do modelo (arquivo ou diretório MLflow inteiro)."""
+    digest = hashlib.blake2b(digest_size=16)
+    if os.path.isdir(model_path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(model_path) for name in names)
+    else:
+        paths = [model_path]
+    for path in paths:
+        digest.update(os.path.relpath(path, model_path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_key(temperatures):
+    """Hash das temperaturas do bloco, a única entrada do modelo."""
+    data = np.ascontiguousarray(temperatures, dtype=np.float64)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Previsões de blocos já pontuados, guardadas em `directory` como arquivos .npy.
+
+    - A chave combina o modelo (nome e versão registrados por register_model, ou o
+      hash do artefato) com o hash das entradas do bloco; outro modelo nunca reaproveita
+      previsões antigas.
+    - Cada arquivo é escrito em um temporário e publicado com os.replace (atômico), então
+      vários processos podem ler e gravar o mesmo diretório sem ver arquivos parciais.
+    - Acertos atualizam o mtime do arquivo; quando o diretório passa de `max_bytes`, os
+      arquivos menos usados recentemente são removidos (um processo por vez, via flock).
+    """
+
+    def __init__(self, directory, model_name, model_version, max_bytes=1 << 30):
+        self.directory = directory
+        self.namespace = f"{model_name}:{model_version}"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.rows_hit = 0
+        self.rows_missed = 0
+        self._written = 0
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.blake2b(f"{self.namespace}/{key}".encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.directory, "objects", name[:2], name + ".npy")
+
+    def get(self, key):
+        """Previsões guardadas para `key`, ou None."""
+        path = self._path(key)
+        try:
+            predictions = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            # Ausente, removido por outro processo ou ilegível: trata como falta
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.rows_hit += len(predictions)
+        return predictions
+
+    def put(self, key, predictions):
+        predictions = np.asarray(predictions, dtype=np.float64)
+        self.rows_missed += len(predictions)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                np.save(f, predictions, allow_pickle=False)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self._written += predictions.nbytes
+        if self._written > self.max_bytes // 10:
+            self.evict()
+
+    def _files(self):
+        files = []
+        for root, _, names in os.walk(os.path.join(self.directory, "objects")):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp") and time.time() - stat.st_mtime > 3600:
+                    # Temporário de um processo que morreu antes do os.replace
+                    os.unlink(path)
+                    continue
+                if name.endswith(".npy"):
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def evict(self):
+        """Remove os arquivos menos usados até o diretório ficar em 90% de `max_bytes`."""
+        self._written = 0
+        with open(os.path.join(self.directory, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            files = self._files()
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rows = self.rows_hit + self.rows_missed
+        return {
+            "model": self.namespace,
+            "chunks_hit": self.hits,
+            "chunks_missed": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "rows_hit": self.rows_hit,
+            "rows_scored": self.rows_missed,
+            "row_hit_ratio": self.rows_hit / rows if rows else 0.0
+        }
+
+
+def record_run(directory, stats, **details):
+    """Acrescenta o resumo de uma execução ao histórico runs.jsonl do cache."""
+    entry = dict(details, timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"), **stats)
+    with open(os.path.join(directory, RUNS_FILE), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# Servidor local de pontuação com micro-batching para o modelo de vendas de sorvete
+
+import json
+import queue
+import random
+import argparse
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from features import select_features
+from payload_codec import JSON, decode_request, encode_response, negotiate
+from prediction_cache import PredictionCache
+from telemetry import MetricsRegistry, setup_tracing, span
+
+# Limites dos histogramas de /metrics: latência (s) e linhas por chamada ao modelo
+LATENCY_BUCKETS_S = [0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+BATCH_ROWS_BUCKETS = [1, 8, 32, 128, 512, 2048, 8192, 32768, 131072]
+
+
+def load_model(model_path):
+    """
+    Carrega o modelo salvo por create_train_model_if_needed (formato MLflow) ou um
+    artefato compacto de coeficientes (.npz/.json), que dispensa MLflow e scikit-learn.
+    """
+    with span("load_model", path=model_path):
+        if model_path.endswith((".npz", ".json")):
+            from coef_model import load_coef_model
+
+            return load_coef_model(model_path)
+
+        import mlflow.sklearn
+
+        return mlflow.sklearn.load_model(model_path)
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em uma única chamada vetorizada de predict.
+
+    A primeira requisição abre uma janela de `window_ms` milissegundos; tudo o que
+    chegar dentro dela (até `max_batch_rows` linhas) é pontuado de uma só vez.
+    `on_batch(linhas, requisições, segundos)`, se definido, é chamado após cada lote.
+    """
+
+    def __init__(self, model, window_ms=2.0, max_batch_rows=65536):
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.batches = 0
+        self.rows = 0
+        self.on_batch = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """Enfileira uma matriz de entrada e retorna um Future com as previsões."""
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def predict(self, features, timeout=None):
+        """Atalho bloqueante para submit(...).result()."""
+        return self.submit(features).result(timeout)
+
+    def _collect(self):
+        """Aguarda a primeira requisição e junta as que chegarem dentro da janela."""
+        pending = [self._queue.get()]
+        rows = len(pending[0][0])
+        deadline = time.perf_counter() + self.window
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            rows += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            self._score(self._collect())
+
+    def _score(self, pending):
+        """Pontua um lote; se ele falhar, cada requisição é repetida sozinha e só a culpada recebe o erro."""
+        sizes = [len(features) for features, _ in pending]
+        try:
+            with span("predict", requests=len(pending)):
+                start = time.perf_counter()
+                batch = np.concatenate([features for features, _ in pending])
+                predictions = np.asarray(self.model.predict(batch)).ravel()
+        except Exception as e:
+            if len(pending) == 1:
+                pending[0][1].set_exception(e)
+            else:
+                for item in pending:
+                    self._score([item])
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        if self.on_batch is not None:
+            self.on_batch(len(batch), len(pending), time.perf_counter() - start)
+        for (_, future), result in zip(pending, np.split(predictions, np.cumsum(sizes)[:-1])):
+            future.set_result(result)
+
+
+class FaultInjector:
+    """
+    Atrasos e falhas artificiais para ensaiar clientes contra o servidor local: latência
+    extra por requisição, uma fração de respostas `error_status` (503 ou 429), 429 acima
+    de `max_in_flight` requisições simultâneas e 413 acima de `max_request_bytes`.
+    """
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0, error_status=503, max_in_flight=None,
+                 max_request_bytes=None, seed=None):
+        self.latency_s = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_in_flight = max_in_flight
+        self.max_request_bytes = max_request_bytes
+        self.in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def admit(self, length):
+        """Retorna None se a requisição deve ser atendida (e a conta como em andamento) ou (status, mensagem)."""
+        if self.max_request_bytes and length > self.max_request_bytes:
+            return 413, f"Corpo de {length} bytes acima do limite de {self.max_request_bytes}"
+        with self._lock:
+            if self._random.random() < self.error_rate:
+                return self.error_status, "Falha injetada"
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return 429, "Muitas requisições simultâneas"
+            self.in_flight += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return None
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """
+    Atende POST com o mesmo contrato do endpoint gerenciado do Azure ML e, além dele,
+    corpos binários (float32, .npy, Arrow IPC) definidos pelo Content-Type.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em escritas separadas; sem TCP_NODELAY o ACK atrasado soma ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        started = time.perf_counter()
+        with span("request", path=self.path) as request_span:
+            status = self._score()
+            request_span.set(status=status)
+        if self.server.metrics is not None:
+            self.server.metrics.requests.inc(status=status)
+            self.server.metrics.latency.observe(time.perf_counter() - started)
+
+    def _score(self):
+        # O corpo é sempre lido, mesmo quando rejeitado, para não corromper a conexão keep-alive
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        faults = self.server.faults
+        if faults is None:
+            return self._predict(body)
+        rejection = faults.admit(length)
+        if rejection is not None:
+            self._send_json(rejection[0], {"error": rejection[1]})
+            return rejection[0]
+        try:
+            return self._predict(body)
+        finally:
+            faults.release()
+
+    def _predict(self, body):
+        content_type = self.headers.get("Content-Type")
+        try:
+            with span("decode", content_type=content_type):
+                columns, data = decode_request(body, content_type)
+                features = select_features(columns, data, self.server.n_features)
+                response_type = negotiate(content_type, self.headers.get("Accept"))
+        except Exception as e:
+            self._send_json(400, {"error": f"Requisição inválida: {e}"})
+            return 400
+
+        try:
+            with span("wait_batch", rows=len(features)):
+                predictions = self.server.batcher.predict(features, timeout=self.server.timeout_s)
+        except Exception as e:
+            self._send_json(500, {"error": f"Erro ao pontuar: {e}"})
+            return 500
+
+        with span("encode", content_type=response_type):
+            body = encode_response(predictions, response_type)
+        self._send(200, body, response_type)
+        return 200
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/metrics" and self.server.metrics is not None:
+            self._send(200, self.server.metrics.registry.render(), MetricsRegistry.content_type)
+            return
+        if path != "/stats":
+            self._send_json(404, {"error": "Rota não encontrada"})
+            return
+        stats = {"batches": self.server.batcher.batches, "rows": self.server.batcher.rows}
+        if self.server.cache is not None:
+            stats["cache"] = self.server.cache.stats()
+        self._send_json(200, stats)
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, body):
+        self._send(status, json.dumps(body).encode("utf-8"), JSON)
+
+    def log_message(self, format, *args):
+        # O log padrão por requisição custa mais que a própria previsão
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer com fila de conexões compatível com muitos clientes simultâneos."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class ScoringMetrics:
+    """Métricas Prometheus do servidor; só existem quando /metrics está ativado."""
+
+    def __init__(self, server):
+        registry = self.registry = MetricsRegistry()
+        self.requests = registry.counter("score_requests_total", "Requisições de pontuação por status HTTP", labels=["status"])
+        self.latency = registry.histogram("score_request_duration_seconds", "Latência das requisições de pontuação", LATENCY_BUCKETS_S)
+        self.batch_rows = registry.histogram("score_batch_rows", "Linhas por chamada ao modelo", BATCH_ROWS_BUCKETS)
+        self.batch_requests = registry.histogram("score_batch_requests", "Requisições agrupadas por chamada ao modelo", BATCH_ROWS_BUCKETS)
+        self.predict_latency = registry.histogram("score_predict_duration_seconds", "Tempo de cada chamada ao modelo", LATENCY_BUCKETS_S)
+        registry.counter_func("score_batches_total", "Chamadas ao modelo desde o início", lambda: server.batcher.batches)
+        registry.counter_func("score_rows_total", "Linhas pontuadas desde o início", lambda: server.batcher.rows)
+        if server.cache is not None:
+            registry.counter_func("score_cache_hits_total", "Acertos do cache de previsões", lambda: server.cache.hits)
+            registry.counter_func("score_cache_misses_total", "Faltas do cache de previsões", lambda: server.cache.misses)
+            registry.gauge("score_cache_hit_ratio", "Taxa de acerto do cache de previsões", lambda: server.cache.stats()["hit_ratio"])
+
+    def on_batch(self, rows, requests, seconds):
+        self.batch_rows.observe(rows)
+        self.batch_requests.observe(requests)
+        self.predict_latency.observe(seconds)
+
+
+def create_server(model, host="127.0.0.1", port=5001, window_ms=2.0, max_batch_rows=65536,
+                  timeout_s=30.0, verbose=False, cache_mode=None, cache_size=100000, model_version="local",
+                  metrics=False, faults=None):
+    """
+    Cria (sem iniciar) o servidor HTTP de pontuação para um modelo já carregado.
+    Com `cache_mode` ("lru" ou "table"), as previsões passam por um PredictionCache.
+    Com `metrics`, GET /metrics expõe contadores e histogramas no formato do Prometheus.
+    Com `faults` (um FaultInjector), o servidor simula um endpoint lento ou sobrecarregado.
+    """
+    server = ScoringServer((host, port), ScoringHandler)
+    server.cache = None
+    if cache_mode:
+        server.cache = PredictionCache(model, model_version=model_version, mode=cache_mode, max_entries=cache_size)
+    server.batcher = MicroBatcher(server.cache or model, window_ms=window_ms, max_batch_rows=max_batch_rows)
+    server.n_features = getattr(model, "n_features_in_", 1)
+    server.timeout_s = timeout_s
+    server.verbose = verbose
+    server.faults = faults
+    server.metrics = None
+    if metrics:
+        server.metrics = ScoringMetrics(server)
+        server.batcher.on_batch = server.metrics.on_batch
+    return server
+
+
+def start_background_server(model, **kwargs):
+    """Inicia o servidor em uma thread e retorna (server, url) — útil como alvo local de testes."""
+    kwargs.setdefault("port", 0)
+    server = create_server(model, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, name="score-server", daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/score"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de pontuação para o modelo de vendas de sorvete")
+    parser.add_argument("--model-path", type=str, default="mlflow_model", help="Caminho do modelo (diretório MLflow ou artefato .npz/.json)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=5001, help="Porta de escuta")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="Janela de agrupamento de requisições (ms)")
+    parser.add_argument("--max-batch-rows", type=int, default=65536, help="Máximo de linhas por chamada ao modelo")
+    parser.add_argument("--cache", type=str, choices=["lru", "table"], help="Ativa o cache de previsões por temperatura quantizada")
+    parser.add_argument("--cache-size", type=int, default=100000, help="Máximo de entradas no cache LRU")
+    parser.add_argument("--model-version", type=str, help="Versão do modelo usada na chave do cache (padrão: a do artefato)")
+    parser.add_argument("--metrics", action="store_true", help="Expõe métricas Prometheus em GET /metrics")
+    parser.add_argument("--trace", type=str, help="Registra spans de cada etapa e os salva neste JSON ao encerrar")
+    parser.add_argument("--verbose", action="store_true", help="Registra cada requisição no console")
+    parser.add_argument("--inject-latency-ms", type=float, default=0.0, help="Atraso artificial por requisição (ms)")
+    parser.add_argument("--inject-error-rate", type=float, default=0.0, help="Fração de requisições respondidas com --inject-error-status")
+    parser.add_argument("--inject-error-status", type=int, choices=[429, 500, 503], default=503, help="Status das falhas injetadas")
+    parser.add_argument("--max-in-flight", type=int, help="Responde 429 acima deste número de requisições simultâneas")
+    parser.add_argument("--max-request-bytes", type=int, help="Responde 413 para corpos maiores que este limite")
+
+    args = parser.parse_args()
+    setup_tracing(args.trace)
+
+    faults = None
+    if args.inject_latency_ms or args.inject_error_rate or args.max_in_flight or args.max_request_bytes:
+        faults = FaultInjector(args.inject_latency_ms, args.inject_error_rate, args.inject_error_status,
+                               args.max_in_flight, args.max_request_bytes)
+
+    model = load_model(args.model_path)
+    server = create_server(
+        model,
+        host=args.host,
+        port=args.port,
+        window_ms=args.batch_window_ms,
+        max_batch_rows=args.max_batch_rows,
+        verbose=args.verbose,
+        cache_mode=args.cache,
+        cache_size=args.cache_size,
+        model_version=args.model_version or getattr(model, "model_version", "") or "local",
+        metrics=args.metrics,
+        faults=faults
+    )
+    print(f"Servidor de pontuação em http://{args.host}:{args.port}/score (janela de {args.batch_window_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando servidor...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# Cliente de pontuação para entradas grandes: lotes adaptativos, concorrência limitada, novas tentativas e ordem preservada
+
+import time
+import heapq
+import random
+import argparse
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+import endpoint_client
+from payload_codec import FORMATS, decode_response, encode_request
+from telemetry import span
+
+# Respostas que indicam sobrecarga ou falha passageira: o lote é reenviado
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+
+class ScoringError(Exception):
+    """Um lote falhou de forma definitiva (erro não recuperável ou tentativas esgotadas)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _Retry(Exception):
+    def __init__(self, reason, status=None, retry_after=None):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _TooLarge(Exception):
+    def __init__(self, reason, request_bytes=None, timed_out=False):
+        super().__init__(reason)
+        self.request_bytes = request_bytes
+        self.timed_out = timed_out
+
+
+class ScoringClient:
+    """
+    Pontua um array de temperaturas em lotes enviados em paralelo ao endpoint.
+
+    - O tamanho do lote é ajustado para que cada requisição leve perto de `target_latency_s`
+      e é reduzido à metade quando o corpo passa de `max_request_bytes` ou o servidor
+      responde 413 / estoura o tempo de leitura (o lote é dividido e reenviado). Divisões
+      por tempo esgotado contam como tentativas, limitadas por `max_retries`.
+    - A concorrência cresce de 1 em 1 enquanto a latência fica dentro da meta e cai pela
+      metade a cada episódio de 429/503 (aumento aditivo, redução multiplicativa).
+    - Falhas passageiras são reenviadas com espera exponencial com jitter ("full jitter"),
+      respeitando Retry-After quando o servidor o envia.
+    - Os resultados saem na ordem da entrada assim que o trecho inicial está completo; novos
+      lotes só são enviados enquanto o consumidor lê, e no máximo `max_buffered_rows` linhas
+      ficam esperando por um lote atrasado.
+    """
+
+    def __init__(self, url, endpoint_key=None, payload_format="json", batch_rows=1000, min_batch_rows=16,
+                 max_batch_rows=50000, max_request_bytes=1_000_000, concurrency=2, max_concurrency=16,
+                 target_latency_s=0.5, max_retries=6, backoff_s=0.25, max_backoff_s=20.0, timeout=60,
+                 max_buffered_rows=None, auth=True):
+        self.url = url
+        self.endpoint_key = endpoint_key
+        self.auth = auth
+        self.payload_format = payload_format
+        self.batch_rows = batch_rows
+        self.min_batch_rows = min_batch_rows
+        self.max_batch_rows = max_batch_rows
+        self.max_request_bytes = max_request_bytes
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency_s = target_latency_s
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.timeout = timeout
+        self.max_buffered_rows = max_buffered_rows
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._row_bytes = None
+        self.counts = {"requests": 0, "retries": 0, "throttled": 0, "splits": 0, "rows": 0}
+        self.history = []
+        # Autenticação resolvida na criação: credencial ausente vira ScoringError antes do primeiro lote.
+        # Só tokens do Azure AD são consultados de novo a cada lote (o TokenCache os renova)
+        self._headers = self._auth_headers() if auth else {}
+        self._token_auth = auth and not endpoint_key and not endpoint_client.is_local(url)
+
+    def _auth_headers(self):
+        try:
+            return endpoint_client.get_auth_header(self.endpoint_key, url=self.url)
+        except Exception as e:
+            raise ScoringError(f"Falha ao autenticar no endpoint: {type(e).__name__}: {e}")
+
+    def _post(self, temperatures):
+        """Envia um lote e retorna (previsões, segundos). Levanta _Retry, _TooLarge ou ScoringError."""
+        with span("encode", format=self.payload_format, rows=len(temperatures)):
+            body, content_type = encode_request(temperatures, self.payload_format)
+        self._row_bytes = len(body) / len(temperatures)
+        if len(body) > self.max_request_bytes and len(temperatures) > 1:
+            raise _TooLarge(f"{len(body)} bytes")
+
+        headers = dict(self._auth_headers() if self._token_auth else self._headers)
+        headers["Content-Type"] = content_type
+        headers["Accept"] = content_type
+
+        started = time.perf_counter()
+        try:
+            response = endpoint_client.post(self.url, body, headers, timeout=self.timeout)
+        except Exception as e:
+            from requests.exceptions import ReadTimeout
+
+            # Só a leitura esgotada sugere um lote lento demais; conexão recusada/derrubada e
+            # ConnectTimeout não dependem do tamanho e são tratados como passageiros
+            if isinstance(e, ReadTimeout) and len(temperatures) > 1:
+                raise _TooLarge(f"tempo limite ({e})", timed_out=True)
+            raise _Retry(f"{type(e).__name__}: {e}")
+        elapsed = time.perf_counter() - started
+
+        if response.status_code == 200:
+            with span("decode", response_bytes=len(response.content)):
+                predictions = decode_response(response.content, response.headers.get("Content-Type"))
+            if len(predictions) != len(temperatures):
+                raise ScoringError(f"O endpoint devolveu {len(predictions)} previsões para {len(temperatures)} linhas")
+            return predictions, elapsed
+        if response.status_code == 413 and len(temperatures) > 1:
+            raise _TooLarge("413", len(body))
+        if response.status_code in RETRYABLE_STATUS:
+            raise _Retry(f"HTTP {response.status_code}", response.status_code, _retry_after(response))
+        raise ScoringError(f"HTTP {response.status_code}: {response.text[:200]}", response.status_code)
+
+    def _on_success(self, rows, elapsed):
+        self.counts["requests"] += 1
+        self.counts["rows"] += rows
+        self.history.append({"rows": rows, "latency_ms": elapsed * 1000.0, "concurrency": self.concurrency})
+
+        # Lote proporcional à vazão observada, com no máximo o dobro do atual por passo
+        if rows >= self.batch_rows // 2:
+            ideal = rows * self.target_latency_s / max(elapsed, 1e-3)
+            self.batch_rows = int(min(max(ideal, self.batch_rows / 2), self.batch_rows * 2))
+            self._clamp_batch_rows()
+
+        if elapsed <= self.target_latency_s:
+            self._successes += 1
+            if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._successes = 0
+
+    def _clamp_batch_rows(self):
+        limit = self.max_batch_rows
+        if self._row_bytes:
+            # Margem de 10%: o tamanho por linha varia com o número de dígitos
+            limit = min(limit, int(self.max_request_bytes * 0.9 / self._row_bytes))
+        self.batch_rows = min(max(self.batch_rows, self.min_batch_rows), limit)
+
+    def _on_throttle(self, sent_at):
+        self.counts["throttled"] += 1
+        # Um único corte por episódio: lotes enviados antes do último corte não contam de novo
+        if sent_at >= self._last_decrease:
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+            self._last_decrease = time.monotonic()
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff_s))
+        return delay
+
+    def iter_scores(self, temperatures):
+        """
+        Gera (início, previsões) em ordem, cobrindo todas as linhas de `temperatures`.
+        Levanta ScoringError se algum lote falhar de forma definitiva.
+        """
+        temperatures = np.asarray(temperatures, dtype=np.float64).ravel()
+        total = len(temperatures)
+        max_buffered = self.max_buffered_rows or 4 * self.max_concurrency * self.max_batch_rows
+        # Lotes a enviar agora: (início, fim, tentativa); os que aguardam nova tentativa ficam no heap
+        ready = []
+        delayed = []
+        results = {}
+        pending = {}
+        next_row = 0
+        emitted = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="scoring") as pool:
+            try:
+                while emitted < total:
+                    now = time.monotonic()
+                    while delayed and delayed[0][0] <= now:
+                        _, start, stop, attempt = heapq.heappop(delayed)
+                        ready.append((start, stop, attempt))
+                    ready.sort()
+
+                    while len(pending) < self.concurrency:
+                        if ready:
+                            start, stop, attempt = ready.pop(0)
+                        elif next_row < total and next_row - emitted < max_buffered:
+                            start, stop, attempt = next_row, min(total, next_row + self.batch_rows), 0
+                            next_row = stop
+                        else:
+                            break
+                        # Copia o contexto para que os spans do lote fiquem sob o span de quem chamou
+                        future = pool.submit(contextvars.copy_context().run, self._timed_post, temperatures[start:stop], attempt)
+                        pending[future] = (start, stop, attempt, time.monotonic())
+
+                    timeout = max(0.0, delayed[0][0] - time.monotonic()) if delayed else None
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED) if pending else (set(), None)
+                    if not pending and timeout:
+                        time.sleep(timeout)
+
+                    for future in done:
+                        start, stop, attempt, sent_at = pending.pop(future)
+                        try:
+                            predictions, elapsed = future.result()
+                        except _TooLarge as e:
+                            # Divide o lote e reduz os próximos; as metades mantêm a posição na saída.
+                            # Um 413 revela o limite real do servidor, que passa a valer para os próximos lotes
+                            if e.timed_out:
+                                if attempt >= self.max_retries:
+                                    raise ScoringError(f"Linhas {start}-{stop}: {e} após {attempt + 1} tentativas")
+                                attempt += 1
+                            self.counts["splits"] += 1
+                            if e.request_bytes:
+                                self.max_request_bytes = min(self.max_request_bytes, e.request_bytes - 1)
+                            self.batch_rows = min(self.batch_rows, (stop - start) // 2)
+                            self._clamp_batch_rows()
+                            middle = (start + stop) // 2
+                            ready += [(start, middle, attempt), (middle, stop, attempt)]
+                            continue
+                        except _Retry as e:
+                            if e.status in THROTTLE_STATUS:
+                                self._on_throttle(sent_at)
+                            if attempt >= self.max_retries:
+                                raise ScoringError(f"Linhas {start}-{stop}: {e} após {attempt + 1} tentativas", e.status)
+                            self.counts["retries"] += 1
+                            heapq.heappush(delayed, (time.monotonic() + self._backoff(attempt, e.retry_after), start, stop, attempt + 1))
+                            continue
+                        self._on_success(stop - start, elapsed)
+                        results[start] = predictions
+
+                    while emitted in results:
+                        predictions = results.pop(emitted)
+                        yield emitted, predictions
+                        emitted += len(predictions)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _timed_post(self, temperatures, attempt):
+        with span("score_batch", rows=len(temperatures), attempt=attempt):
+            return self._post(temperatures)
+
+    def score(self, temperatures):
+        """Pontua tudo e retorna as previsões concatenadas na ordem da entrada."""
+        parts = [predictions for _, predictions in self.iter_scores(temperatures)]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def stats(self):
+        latencies = [item["latency_ms"] for item in self.history]
+        return dict(
+            self.counts,
+            batch_rows=self.batch_rows,
+            concurrency=self.concurrency,
+            p50_ms=float(np.percentile(latencies, 50)) if latencies else None,
+            p99_ms=float(np.percentile(latencies, 99)) if latencies else None
+        )
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def add_client_arguments(parser):
+    """Opções do ScoringClient compartilhadas pelas CLIs que pontuam muitas linhas."""
+    parser.add_argument("--batch-rows", type=int, default=1000, help="Linhas do primeiro lote (depois ajustado pela latência)")
+    parser.add_argument("--max-batch-rows", type=int, default=50000, help="Máximo de linhas por requisição")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Máximo de requisições simultâneas")
+    parser.add_argument("--target-latency-ms", type=float, default=500.0, help="Latência desejada por requisição")
+    parser.add_argument("--max-retries", type=int, default=6, help="Novas tentativas por lote em 429/503/erros de rede")
+
+
+def client_from_args(url, args, endpoint_key=None, payload_format="json", auth=True):
+    return ScoringClient(
+        url,
+        endpoint_key=endpoint_key,
+        payload_format=payload_format,
+        auth=auth,
+        batch_rows=args.batch_rows,
+        max_batch_rows=args.max_batch_rows,
+        max_concurrency=args.max_concurrency,
+        target_latency_s=args.target_latency_ms / 1000.0,
+        max_retries=args.max_retries
+    )
+
+
+def print_stats(stats, rows, elapsed):
+    print(f"{rows} linhas em {elapsed:.2f}s ({rows / elapsed:.0f} linhas/s): {stats['requests']} requisições, "
+          f"{stats['retries']} novas tentativas ({stats['throttled']} por 429/503), {stats['splits']} lotes divididos")
+    if stats["p50_ms"] is not None:
+        print(f"Lote final: {stats['batch_rows']} linhas, concorrência {stats['concurrency']}, "
+              f"latência p50 {stats['p50_ms']:.1f} ms / p99 {stats['p99_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pontua um CSV ou uma série sintética de temperaturas em lotes adaptativos")
+    parser.add_argument("--endpoint-url", type=str, default="http://127.0.0.1:5001/score", help="URL do endpoint")
+    parser.add_argument("--endpoint-key", type=str, help="Chave de API do endpoint (opcional)")
+    parser.add_argument("--no-auth", action="store_true", help="Não envia autenticação (localhost já dispensa)")
+    parser.add_argument("--input", type=str, help="CSV com a coluna 'temperatura' (padrão: temperaturas sintéticas)")
+    parser.add_argument("--rows", type=int, default=100000, help="Linhas sintéticas quando --input não é informado")
+    parser.add_argument("--output", type=str, help="Salva as previsões neste arquivo .npy")
+    parser.add_argument("--format", type=str, choices=sorted(FORMATS), default="json", help="Formato do corpo da requisição")
+    add_client_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.input:
+        import pandas as pd
+        temperatures = pd.read_csv(args.input, usecols=["temperatura"])["temperatura"].to_numpy(dtype=np.float64)
+    else:
+        temperatures = np.random.default_rng(0).uniform(10, 40, args.rows)
+
+    try:
+        client = client_from_args(args.endpoint_url, args, args.endpoint_key, args.format, auth=not args.no_auth)
+    except ScoringError as e:
+        print(f"Erro: {e}")
+        exit(1)
+    start = time.perf_counter()
+    try:
+        predictions = client.score(temperatures)
+    except ScoringError as e:
+        print(f"Erro ao pontuar: {e}")
+        print_stats(client.stats(), client.counts["rows"], time.perf_counter() - start)
+        exit(1)
+    print_stats(client.stats(), len(predictions), time.perf_counter() - start)
+
+    if args.output:
+        np.save(args.output, predictions)
+        print(f"Previsões salvas em '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
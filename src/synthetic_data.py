@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Gerador vetorizado de dados sintéticos de vendas de sorvete (uma ou muitas lojas)
+
+import time
+import argparse
+
+import numpy as np
+
+START_DATE = "2023-01-01"
+
+# Blocos fixos de lojas × dias: cada bloco tem seu próprio gerador aleatório, então o
+# resultado depende apenas da semente, e a memória usada fica limitada a um bloco por vez
+STORES_PER_BLOCK = 256
+DAYS_PER_BLOCK = 2048
+
+
+def iter_blocks(n_days, n_stores=1, seed=42, store_variation=0.0, start_date=START_DATE):
+    """
+    Gera o processo sazonal de temperatura/vendas em blocos. Cada bloco é um dicionário
+    de arrays com as colunas loja, data, temperatura e vendas, em ordem (data, loja).
+
+    Os blocos percorrem as lojas dentro de cada faixa de DAYS_PER_BLOCK dias, então com
+    até STORES_PER_BLOCK lojas a sequência inteira fica ordenada por data (o que o
+    incremental_train.py exige com --window-days/--decay). Com mais lojas, a ordem é por
+    data apenas dentro de cada grupo de lojas.
+
+    - temperatura = 25 + 5·sen(dia/30·π) + N(0, 2), limitada a [15, 38]
+    - vendas = base + inclinação·(temperatura − 20) + N(0, 15), no mínimo 10
+
+    Com `store_variation` = 0, todas as lojas seguem base 100 e inclinação 10 (o processo
+    original); valores maiores sorteiam base e inclinação por loja com esse desvio relativo.
+    """
+    start = np.datetime64(start_date, "D")
+    params_rng = np.random.default_rng([seed, 0xB0A])
+    base = 100 * (1 + store_variation * params_rng.standard_normal(n_stores))
+    slope = 10 * (1 + store_variation * params_rng.standard_normal(n_stores))
+
+    for day_block, first_day in enumerate(range(0, n_days, DAYS_PER_BLOCK)):
+        days = np.arange(first_day, min(first_day + DAYS_PER_BLOCK, n_days))
+        for store_block, first_store in enumerate(range(0, n_stores, STORES_PER_BLOCK)):
+            stores = np.arange(first_store, min(first_store + STORES_PER_BLOCK, n_stores))
+            rng = np.random.default_rng([seed, store_block, day_block])
+            shape = (len(stores), len(days))
+
+            temperatures = 25 + 5 * np.sin(days / 30 * np.pi) + rng.normal(0, 2, shape)
+            temperatures = np.clip(temperatures, 15, 38)
+            sales = base[stores, None] + slope[stores, None] * (temperatures - 20) + rng.normal(0, 15, shape)
+            sales = np.clip(sales, 10, None).astype(np.int64)
+
+            # Sorteios na forma (loja, dia) para manter os valores de cada semente; saída transposta para (dia, loja)
+            yield {
+                "loja": np.tile(stores, len(days)),
+                "data": np.repeat(start + days, len(stores)),
+                "temperatura": temperatures.T.ravel(),
+                "vendas": sales.T.ravel()
+            }
+
+
+def generate_dataframe(n_days=100, n_stores=1, seed=42, store_variation=0.0):
+    """Gera um dataset pequeno em memória no formato de data/sorvetes.csv (com "loja" se houver várias)."""
+    import pandas as pd
+
+    df = pd.concat([block_to_frame(block, n_stores) for block in iter_blocks(n_days, n_stores, seed, store_variation)])
+    return df.reset_index(drop=True)
+
+
+def block_to_frame(block, n_stores):
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "loja": block["loja"],
+        "data": block["data"].astype(str),
+        "temperatura": block["temperatura"],
+        "vendas": block["vendas"]
+    })
+    return df if n_stores > 1 else df.drop(columns="loja")
+
+
+def write_npy(path, n_days, n_stores, seed, store_variation):
+    """Grava um .npy estruturado via memmap, posicionando cada bloco pela ordem (loja, dia)."""
+    dtype = np.dtype([("loja", "<i4"), ("dia", "<i4"), ("temperatura", "<f4"), ("vendas", "<i4")])
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_stores * n_days,))
+    start = np.datetime64(START_DATE, "D")
+    for block in iter_blocks(n_days, n_stores, seed, store_variation):
+        days = (block["data"] - start).astype(np.int64)
+        index = block["loja"] * n_days + days
+        out["loja"][index] = block["loja"]
+        out["dia"][index] = days
+        out["temperatura"][index] = block["temperatura"]
+        out["vendas"][index] = block["vendas"]
+    out.flush()
+    return len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de vendas de sorvete")
+    parser.add_argument("--days", type=int, default=100, help="Dias por loja")
+    parser.add_argument("--stores", type=int, default=1, help="Número de lojas")
+    parser.add_argument("--seed", type=int, default=42, help="Semente aleatória")
+    parser.add_argument("--store-variation", type=float, default=0.0, help="Desvio relativo de base/inclinação entre lojas")
+    parser.add_argument("--output", type=str, default="sorvete_ml.csv", help="Arquivo de saída (.csv, .parquet ou .npy)")
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.output.endswith(".npy"):
+        rows = write_npy(args.output, args.days, args.stores, args.seed, args.store_variation)
+    else:
+        from chunk_writers import open_writer
+
+        writer = open_writer(args.output)
+        rows = 0
+        try:
+            for block in iter_blocks(args.days, args.stores, args.seed, args.store_variation):
+                writer.write(block_to_frame(block, args.stores))
+                rows += len(block["vendas"])
+        finally:
+            writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Dataset criado com sucesso: {rows} linhas ({args.stores} lojas × {args.days} dias) em {elapsed:.1f}s → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
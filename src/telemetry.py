@@ -0,0 +1,289 @@
+# Instrumentação leve: spans com tempos exportáveis em JSON e métricas no formato de texto do Prometheus
+
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+import contextvars
+from functools import wraps
+
+# Span em andamento no contexto atual (cada thread e cada tarefa asyncio tem o seu)
+_current = contextvars.ContextVar("telemetry_span", default=None)
+_tracer = None
+
+
+class _NoopSpan:
+    """Span devolvido com o rastreamento desligado: não mede nem guarda nada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = _current.get()
+        self.span_id = tracer.next_id()
+
+    def set(self, **attributes):
+        """Acrescenta atributos ao span (por exemplo tamanhos conhecidos só no meio da etapa)."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.record(self, duration)
+        return False
+
+
+class Tracer:
+    """Guarda os spans concluídos em memória (até `max_spans`; os excedentes só são contados)."""
+
+    def __init__(self, max_spans=100000):
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self.origin = time.perf_counter()
+        self._ids = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def record(self, span, duration):
+        entry = {
+            "name": span.name,
+            "id": span.span_id,
+            "parent": span.parent.span_id if span.parent else None,
+            "start_ms": (span.start - self.origin) * 1000.0,
+            "duration_ms": duration * 1000.0,
+            "thread": threading.current_thread().name,
+            "attributes": span.attributes
+        }
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(entry)
+            else:
+                self.dropped += 1
+
+    def summary(self):
+        """Tempo total, médio e máximo por nome de span."""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for entry in spans:
+            item = totals.setdefault(entry["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            item["count"] += 1
+            item["total_ms"] += entry["duration_ms"]
+            item["max_ms"] = max(item["max_ms"], entry["duration_ms"])
+        for item in totals.values():
+            item["mean_ms"] = item["total_ms"] / item["count"]
+        return totals
+
+    def export(self, path):
+        """
+        Salva os spans em JSON no formato de eventos do Chrome (abre em chrome://tracing
+        ou no Perfetto), com o resumo por nome de span junto.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        for entry in spans:
+            tid = threads.setdefault(entry["thread"], len(threads) + 1)
+            events.append({
+                "name": entry["name"],
+                "ph": "X",
+                "ts": entry["start_ms"] * 1000.0,
+                "dur": entry["duration_ms"] * 1000.0,
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": dict(entry["attributes"], id=entry["id"], parent=entry["parent"])
+            })
+        events += [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                   for name, tid in threads.items()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "summary": self.summary(), "dropped_spans": self.dropped}, f, default=str)
+
+
+def enable_tracing(max_spans=100000):
+    """Liga o rastreamento no processo e retorna o Tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(max_spans)
+    return _tracer
+
+
+def span(name, **attributes):
+    """
+    Context manager que mede uma etapa. Com o rastreamento desligado retorna sempre o
+    mesmo objeto vazio, então o custo é o de uma chamada de função.
+    """
+    if _tracer is None:
+        return _NOOP
+    return Span(_tracer, name, attributes)
+
+
+def traced(name=None):
+    """Decorador equivalente a envolver a função inteira em span(name)."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with Span(_tracer, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def setup_tracing(path):
+    """
+    Liga o rastreamento e agenda, para o fim do processo, a exportação em `path` e um
+    resumo no console. Sem `path`, usa a variável de ambiente SORVETE_TRACE (se houver).
+    """
+    path = path or os.environ.get("SORVETE_TRACE")
+    if not path:
+        return None
+    tracer = enable_tracing()
+
+    def finish():
+        tracer.export(path)
+        print_summary(tracer)
+        print(f"Trace salvo em '{path}'")
+
+    atexit.register(finish)
+    return tracer
+
+
+def print_summary(tracer):
+    print("\n==== Tempo por etapa ====")
+    for name, item in sorted(tracer.summary().items(), key=lambda pair: -pair[1]["total_ms"]):
+        print(f"{name:<32} {item['count']:>7}x {item['total_ms']:>10.1f} ms total {item['mean_ms']:>9.2f} ms médio")
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, "") for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labels, key)} {value}" for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def render(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + ["+Inf"], counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{self.name}_sum {total}", f"{self.name}_count {cumulative}"]
+        return lines
+
+
+class Gauge:
+    """
+    Valor lido na hora da coleta por `func` (por exemplo contadores de outro objeto).
+    Com kind="counter" é exposto como contador, para totais que só crescem.
+    """
+
+    def __init__(self, name, help_text, func, kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.kind = kind
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {self.func()}"]
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exposto como texto no formato do Prometheus."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, buckets):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def gauge(self, name, help_text, func):
+        return self._add(Gauge(name, help_text, func))
+
+    def counter_func(self, name, help_text, func):
+        return self._add(Gauge(name, help_text, func, kind="counter"))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return ("\n".join(lines) + "\n").encode("utf-8")
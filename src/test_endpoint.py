@@ -1,120 +1,81 @@
 #!/usr/bin/env python
 # Script para testar o endpoint do modelo de vendas de sorvete
 
-import json
 import argparse
-import requests
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from azure.identity import DefaultAzureCredential
-from azure.ai.ml import MLClient
+import endpoint_client
+from forecast_analytics import CATEGORIES, UNCATEGORIZED, plot_forecast, summarize
+from payload_codec import FORMATS
+from telemetry import setup_tracing, span
+from load_test import add_benchmark_arguments, print_report, run_benchmark
+from scoring_client import ScoringClient, ScoringError, add_client_arguments, client_from_args
 
-def get_auth_header(endpoint_key=None):
+def get_auth_header(endpoint_key=None, endpoint_url=None, no_auth=False):
     """
     Obtém o cabeçalho de autenticação para o endpoint.
-    Usa uma chave de API se fornecida, ou tenta autenticação via DefaultAzureCredential.
+    Usa uma chave de API se fornecida, ou um token do DefaultAzureCredential mantido
+    em cache até pouco antes de expirar (ver endpoint_client.TokenCache). O servidor
+    local (localhost) e `no_auth` dispensam autenticação.
     """
-    if endpoint_key:
-        return {"Authorization": f"Bearer {endpoint_key}"}
-    
-    # Se nenhuma chave for fornecida, tentamos autenticação via identidade
-    credential = DefaultAzureCredential()
-    return {"Authorization": f"Bearer {credential.get_token('https://ml.azure.com/.default').token}"}
+    if no_auth:
+        return {}
+    return endpoint_client.get_auth_header(endpoint_key, url=endpoint_url)
 
-def test_endpoint(endpoint_url, endpoint_key=None, workspace_name=None, resource_group=None):
+def test_endpoint(endpoint_url, endpoint_key=None, workspace_name=None, resource_group=None, payload_format="json",
+                  headless=False, points=24, client=None):
     """
     Testa o endpoint enviando dados de várias temperaturas e visualizando os resultados.
+    `payload_format` escolhe o corpo da requisição (ver payload_codec.FORMATS); formatos
+    diferentes de "json" só são aceitos pelo servidor local (score_server.py).
+    Com `headless`, nenhum gráfico é gerado e o matplotlib nem chega a ser importado.
+    `points` temperaturas são enviadas em lotes pelo ScoringClient (`client`, se informado),
+    então grades grandes não esbarram no limite de tamanho nem no tempo limite do endpoint.
     """
     print("Testando o endpoint do modelo de vendas de sorvete...")
     
     # Criar uma série de temperaturas para teste
-    temperatures = np.linspace(15, 38, 24)
-    squared_temps = temperatures ** 2
-    
-    # Preparar os dados para a requisição
-    input_data = {
-        "input_data": {
-            "columns": ["temperatura", "temperatura_squared"],
-            "data": [[temp, temp_sq] for temp, temp_sq in zip(temperatures, squared_temps)]
-        }
-    }
-    
-    # Fazer a requisição ao endpoint
-    headers = get_auth_header(endpoint_key)
-    headers["Content-Type"] = "application/json"
+    temperatures = np.linspace(15, 38, points)
     
     try:
-        response = requests.post(endpoint_url, json=input_data, headers=headers)
-        response.raise_for_status()  # Lança exceção para erros HTTP
-        predictions = response.json()
-        
-        # Converter previsões em um array numpy
-        if isinstance(predictions, dict) and "result" in predictions:
-            # Formato comum nos endpoints do Azure ML
-            predictions = predictions["result"]
-        
-        if isinstance(predictions, list):
-            predictions = np.array(predictions)
-        
-        # Criar um DataFrame com os resultados
-        results = pd.DataFrame({
-            "temperatura": temperatures,
-            "vendas_previstas": predictions
-        })
-        
-        # Definir limiares para categorização
-        low_threshold = np.percentile(predictions, 25)
-        high_threshold = np.percentile(predictions, 75)
-        
-        # Adicionar categoria
-        results["categoria"] = pd.cut(
-            results["vendas_previstas"],
-            bins=[0, low_threshold, high_threshold, float("inf")],
-            labels=["Baixa", "Média", "Alta"]
-        )
+        client = client or ScoringClient(endpoint_url, endpoint_key=endpoint_key, payload_format=payload_format)
+        # Lotes com novas tentativas em 429/503; as previsões voltam na ordem das temperaturas
+        with span("score", format=payload_format, rows=len(temperatures)):
+            predictions = client.score(temperatures)
+        if len(temperatures) > 24:
+            stats = client.stats()
+            print(f"{len(predictions)} previsões em {stats['requests']} requisições "
+                  f"({stats['retries']} novas tentativas, lote final de {stats['batch_rows']} linhas)")
+        
+        # Categorias, limiares e sensibilidade calculados direto sobre os arrays
+        with span("analytics"):
+            summary = summarize(temperatures, predictions)
+        codes = summary["codes"]
         
         # Mostrar resultados
         print("\nPrevisões de vendas para diferentes temperaturas:")
-        for i, row in results.sample(5).iterrows():
-            print(f"Temperatura: {row['temperatura']:.1f}°C → Vendas previstas: {row['vendas_previstas']:.0f} unidades ({row['categoria']})")
+        for i in np.sort(np.random.default_rng().choice(len(temperatures), min(5, len(temperatures)), replace=False)):
+            category = CATEGORIES[codes[i]] if codes[i] != UNCATEGORIZED else "sem categoria"
+            print(f"Temperatura: {temperatures[i]:.1f}°C → Vendas previstas: {predictions[i]:.0f} unidades ({category})")
         
-        # Visualizar os resultados
-        plt.figure(figsize=(12, 6))
-        colors = {"Baixa": "blue", "Média": "green", "Alta": "red"}
-        
-        for category, group in results.groupby("categoria"):
-            plt.scatter(group["temperatura"], group["vendas_previstas"], color=colors[category], label=category, alpha=0.7)
-        
-        plt.title("Previsão de Vendas de Sorvete por Temperatura")
-        plt.xlabel("Temperatura (°C)")
-        plt.ylabel("Vendas Previstas (unidades)")
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        plt.tight_layout()
-        
-        # Salvar a figura
-        plt.savefig("previsao_vendas.png")
-        print(f"\nGráfico de previsões salvo como 'previsao_vendas.png'")
+        # Visualizar os resultados (matplotlib só é carregado fora do modo headless)
+        if not headless:
+            with span("plot"):
+                plot_forecast(temperatures, predictions, codes)
         
         # Exibir insights de negócio
         print("\n=== Insights de Negócio ===")
-        print(f"1. Vendas baixas (abaixo de {low_threshold:.0f} unidades): Temperaturas abaixo de {results[results['categoria'] == 'Baixa']['temperatura'].max():.1f}°C")
+        print(f"1. Vendas baixas (abaixo de {summary['low_threshold']:.0f} unidades): Temperaturas abaixo de {summary['low_temperature']:.1f}°C")
         print(f"   → Recomendação: Implementar promoções especiais em dias com estas temperaturas")
         
-        print(f"\n2. Vendas altas (acima de {high_threshold:.0f} unidades): Temperaturas acima de {results[results['categoria'] == 'Alta']['temperatura'].min():.1f}°C")
+        print(f"\n2. Vendas altas (acima de {summary['high_threshold']:.0f} unidades): Temperaturas acima de {summary['high_temperature']:.1f}°C")
         print(f"   → Recomendação: Garantir estoque adicional e considerar staff extra")
         
-        # Calcular aumento médio de vendas para cada 5°C
-        temp_points = [20, 25]
-        sales_at_points = results.set_index("temperatura").loc[temp_points, "vendas_previstas"].values
-        sales_diff = sales_at_points[1] - sales_at_points[0]
-        temp_diff = temp_points[1] - temp_points[0]
-        sales_per_5c = sales_diff / temp_diff * 5
+        # Aumento de vendas a cada 5°C, interpolado entre 20°C e 25°C (fora dos pontos da grade)
+        print(f"\n3. Para cada aumento de 5°C na temperatura, estima-se um aumento de aproximadamente {summary['sales_per_5c']:.0f} unidades nas vendas")
         
-        print(f"\n3. Para cada aumento de 5°C na temperatura, estima-se um aumento de aproximadamente {sales_per_5c:.0f} unidades nas vendas")
-        
-        plt.show()
+        if not headless:
+            import matplotlib.pyplot as plt
+            plt.show()
         
         return True
     
@@ -128,6 +89,8 @@ def get_endpoint_url(endpoint_name, workspace_name, resource_group):
     """
     try:
         # Autenticar com a Azure
+        from azure.identity import DefaultAzureCredential
+        from azure.ai.ml import MLClient
         credential = DefaultAzureCredential()
         
         # Inicializar cliente ML
@@ -151,11 +114,20 @@ if __name__ == "__main__":
     
     parser.add_argument("--endpoint-url", type=str, help="URL do endpoint de teste")
     parser.add_argument("--endpoint-key", type=str, help="Chave de API do endpoint (opcional)")
+    parser.add_argument("--no-auth", action="store_true", help="Não envia autenticação (servidor local em outro host; localhost já dispensa)")
     parser.add_argument("--endpoint-name", type=str, help="Nome do endpoint no Azure ML")
     parser.add_argument("--workspace-name", type=str, help="Nome do workspace do Azure ML")
     parser.add_argument("--resource-group", type=str, help="Nome do grupo de recursos")
+    parser.add_argument("--format", type=str, choices=sorted(FORMATS), default="json", help="Formato do corpo da requisição")
+    parser.add_argument("--headless", action="store_true", help="Não gera gráficos (dispensa o matplotlib)")
+    parser.add_argument("--points", type=int, default=24, help="Temperaturas pontuadas entre 15°C e 38°C")
+    parser.add_argument("--benchmark", action="store_true", help="Executa um teste de carga em vez do teste funcional")
+    parser.add_argument("--trace", type=str, help="Salva os tempos de cada etapa (spans) neste arquivo JSON")
+    add_benchmark_arguments(parser)
+    add_client_arguments(parser)
     
     args = parser.parse_args()
+    setup_tracing(args.trace)
     
     # Obter URL do endpoint se não fornecida diretamente
     endpoint_url = args.endpoint_url
@@ -167,12 +139,37 @@ if __name__ == "__main__":
         parser.print_help()
         exit(1)
     
+    # Modo benchmark: carga concorrente com relatório de latência em JSON
+    if args.benchmark:
+        report = run_benchmark(
+            endpoint_url,
+            headers=get_auth_header(args.endpoint_key, endpoint_url, args.no_auth),
+            concurrency=args.concurrency,
+            duration=args.duration,
+            rows=args.rows,
+            target_rps=args.rps,
+            payload_format=args.format,
+            request_timeout=args.request_timeout
+        )
+        print_report(report, args.benchmark_output)
+        exit(0 if report["succeeded"] else 1)
+    
+    try:
+        client = client_from_args(endpoint_url, args, args.endpoint_key, args.format, auth=not args.no_auth)
+    except ScoringError as e:
+        print(f"Erro: {e}")
+        exit(1)
+    
     # Testar o endpoint
     success = test_endpoint(
         endpoint_url=endpoint_url,
         endpoint_key=args.endpoint_key,
         workspace_name=args.workspace_name,
-        resource_group=args.resource_group
+        resource_group=args.resource_group,
+        payload_format=args.format,
+        headless=args.headless,
+        points=args.points,
+        client=client
     )
     
     if success:
@@ -0,0 +1,5 @@
+# Os módulos de src/ são scripts independentes (importam uns aos outros pelo nome)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,145 @@
+# Cache de tokens e sessões HTTP do endpoint_client, com credencial falsa e servidor local
+
+import time
+import threading
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import endpoint_client
+from endpoint_client import TokenCache
+
+AccessToken = namedtuple("AccessToken", "token expires_on")
+
+
+class CountingCredential:
+    """Credencial falsa: conta as chamadas a get_token e emite tokens com `lifetime` segundos."""
+
+    def __init__(self, lifetime=3600.0, delay=0.0):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_token(self, scope):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+        time.sleep(self.delay)
+        return AccessToken(f"token-{number}", time.time() + self.lifetime)
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_token_is_fetched_once_and_served_from_cache():
+    credential = CountingCredential()
+    cache = TokenCache(credential=credential)
+
+    tokens = {cache.get_token() for _ in range(100)}
+
+    assert tokens == {"token-1"}
+    assert credential.calls == 1
+
+
+def test_concurrent_first_calls_fetch_once():
+    credential = CountingCredential(delay=0.05)
+    cache = TokenCache(credential=credential)
+
+    run_threads(cache.get_token, 20)
+
+    assert credential.calls == 1
+
+
+def test_background_refresh_is_single_flight():
+    credential = CountingCredential(delay=0.1)
+    cache = TokenCache(credential=credential)
+    cache.get_token()
+    # Token ainda válido, mas dentro da margem de renovação em segundo plano
+    cache._token = AccessToken("old", time.time() + 200)
+
+    tokens = []
+    run_threads(lambda: tokens.append(cache.get_token()), 50)
+
+    # Ninguém esperou pela renovação, e só uma foi disparada
+    assert set(tokens) == {"old"}
+    deadline = time.time() + 2
+    while cache.get_token() == "old" and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get_token() == "token-2"
+    assert credential.calls == 2
+
+
+def test_short_lived_tokens_are_not_refetched_on_every_call():
+    # Validade de 2 s, bem abaixo das margens padrão (60 s e 300 s)
+    credential = CountingCredential(lifetime=2.0)
+    cache = TokenCache(credential=credential)
+
+    deadline = time.time() + 1.0
+    while time.time() < deadline:
+        cache.get_token()
+        time.sleep(0.001)
+
+    assert credential.calls <= 2
+
+
+def test_expired_token_is_refreshed_synchronously():
+    credential = CountingCredential()
+    cache = TokenCache(credential=credential)
+    cache.get_token()
+    cache._token = AccessToken("expired", time.time() - 1)
+
+    assert cache.get_token() == "token-2"
+
+
+def test_auth_header_with_key_or_local_url_skips_credential():
+    assert endpoint_client.get_auth_header("chave") == {"Authorization": "Bearer chave"}
+    assert endpoint_client.get_auth_header(url="http://127.0.0.1:5001/score") == {}
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.clients.append(self.client_address)
+        body = b'{"result": [1.0]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    server.clients = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}/score"
+    server.shutdown()
+    server.server_close()
+    endpoint_client.close_sessions()
+
+
+def test_requests_reuse_one_pooled_connection(local_server):
+    server, url = local_server
+
+    for _ in range(10):
+        response = endpoint_client.post(url, b"{}", {"Content-Type": "application/json"})
+        assert response.status_code == 200
+
+    assert endpoint_client.get_session(url) is endpoint_client.get_session(url.replace("/score", "/other"))
+    assert len(server.clients) == 10
+    # Mesma porta de origem: uma única conexão TCP keep-alive para todas as requisições
+    assert len(set(server.clients)) == 1
@@ -0,0 +1,87 @@
+# Provisionamento do deploy_model contra o FakeMLClient (sem Azure)
+
+from types import SimpleNamespace
+
+import pytest
+
+import deploy_model
+from fake_ml_client import ENTITIES, FakeMLClient
+
+DELAYS = {"compute": 0.6, "data": 0.1, "models": 0.4, "online_endpoints": 0.4, "online_deployments": 0.2}
+
+
+def make_args(**overrides):
+    args = dict(
+        model_path=None, model_name="sorvete-vendas-model", endpoint_name="sorveteria-endpoint",
+        deployment_name="sorvete-deployment", instance_type="Standard_DS2_v2", instance_count=1,
+        worker_count=None, rollout="direct", compute_name="cpu-cluster", skip_test=True, sequential=False
+    )
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+def called(client, kind, method="create_or_update"):
+    return [name for call_kind, call_method, name in client.calls if call_kind == kind and call_method == method]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # ensure_dataset e get_endpoint_details gravam arquivos no diretório atual
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_model_and_endpoint_are_created_concurrently(workdir):
+    client = FakeMLClient(DELAYS)
+    results, report = deploy_model.provision(client, make_args(model_path="mlflow_model"))
+
+    assert report["succeeded"]
+    assert results["detalhes"] == (client.scoring_uri, "fake-key-sorveteria-endpoint")
+    assert client.online_endpoints.get("sorveteria-endpoint").traffic == {"sorvete-deployment": 100}
+    steps = {record["name"]: record for record in report["steps"]}
+    assert steps["modelo"]["start_s"] < steps["endpoint"]["end_s"]
+    assert steps["endpoint"]["start_s"] < steps["modelo"]["end_s"]
+    assert report["wall_s"] < report["sequential_s"]
+    # Com --model-path não há cluster nem dataset
+    assert not called(client, "compute") and not called(client, "data")
+
+
+def test_registered_model_skips_training_resources(workdir):
+    client = FakeMLClient(DELAYS)
+    client.models.create_or_update(ENTITIES.Model(name="sorvete-vendas-model", path="mlflow_model"))
+
+    _, report = deploy_model.provision(client, make_args())
+
+    assert report["succeeded"]
+    assert {record["name"] for record in report["steps"]} == {"modelo", "endpoint", "implantacao", "detalhes"}
+    assert not called(client, "compute") and not called(client, "data")
+    assert called(client, "models") == ["sorvete-vendas-model"]
+
+
+def test_training_resource_failure_does_not_fail_deployment(workdir, monkeypatch):
+    client = FakeMLClient(DELAYS)
+    monkeypatch.setattr(deploy_model, "train_local_model", lambda: "mlflow_model")
+
+    def broken(entity):
+        raise RuntimeError("cota de núcleos esgotada")
+
+    monkeypatch.setattr(client.compute, "begin_create_or_update", broken)
+
+    _, report = deploy_model.provision(client, make_args())
+
+    steps = {record["name"]: record for record in report["steps"]}
+    assert steps["computacao"]["status"] == "failed" and steps["computacao"]["optional"]
+    assert steps["dataset"]["status"] == "ok"
+    assert steps["implantacao"]["status"] == "ok"
+    assert report["succeeded"]
+    assert (workdir / "sorvete_ml.csv").exists()
+
+
+def test_sequential_runs_one_step_at_a_time(workdir):
+    client = FakeMLClient(DELAYS)
+    _, report = deploy_model.provision(client, make_args(model_path="mlflow_model", sequential=True))
+
+    executed = sorted((record for record in report["steps"] if "start_s" in record), key=lambda record: record["start_s"])
+    for previous, current in zip(executed, executed[1:]):
+        assert current["start_s"] >= previous["end_s"]
+    assert report["succeeded"]
@@ -0,0 +1,46 @@
+# ScoringClient contra o score_server local e contra um endpoint que nunca responde
+
+import socket
+
+import numpy as np
+import pytest
+
+import endpoint_client
+from coef_model import CoefModel
+from score_server import start_background_server
+from scoring_client import ScoringClient, ScoringError
+
+
+@pytest.fixture
+def server_url():
+    server, url = start_background_server(CoefModel([10.0], -100.0), window_ms=0.0)
+    yield url
+    server.shutdown()
+    endpoint_client.close_sessions()
+
+
+def test_scores_in_input_order_across_batches(server_url):
+    temperatures = np.linspace(15, 38, 5000)
+    client = ScoringClient(server_url, batch_rows=300, concurrency=4)
+
+    predictions = client.score(temperatures)
+
+    np.testing.assert_allclose(predictions, 10.0 * temperatures - 100.0)
+    assert client.counts["requests"] > 1
+
+
+def test_unanswered_requests_give_up_after_max_retries():
+    # Aceita a conexão (backlog do kernel), mas nunca responde: cada lote esgota o tempo de leitura
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(256)
+    url = f"http://127.0.0.1:{listener.getsockname()[1]}/score"
+    try:
+        client = ScoringClient(url, timeout=0.2, batch_rows=256, max_retries=2, backoff_s=0.01)
+        with pytest.raises(ScoringError, match="3 tentativas"):
+            client.score(np.arange(256.0))
+        # Cada divisão por tempo esgotado gasta uma tentativa: 256 → 128 → 64 e desiste
+        assert client.counts["splits"] <= 4
+    finally:
+        listener.close()
+        endpoint_client.close_sessions()